@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+bench_directory = os.path.dirname(os.path.abspath(__file__))
+
+if not bench_directory in os.environ.get("LD_LIBRARY_PATH", "").split(os.pathsep):
+    os.environ["LD_LIBRARY_PATH"] = os.pathsep.join([bench_directory] + [path for path in os.environ.get("LD_LIBRARY_PATH", "").split(os.pathsep) if path])
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+sys.path.insert(0, os.path.dirname(bench_directory))
+
+import sqlpydb
+
+columns = "i,d,s20"
+
+def select_statement(rows):
+    return "SELECT * FROM bench /* rows=" + str(rows) + " cols=" + columns + " */"
+
+insert_statement = "INSERT INTO bench VALUES (?, ?, ?) /* params=" + columns + " */"
+
+def parameter_rows(rows):
+    return [(row, row * 0.5, "row" + str(row), ) for row in range(rows)]
+
+def bench_connect(options, connection):
+    for index in range(options.operations):
+        sqlpydb.connect(options.connection_string).close()
+
+    return options.operations
+
+def bench_execute(options, connection):
+    cursor = connection.cursor()
+
+    for index in range(options.operations):
+        cursor.execute("SELECT 1 /* cols=i */")
+
+    cursor.close()
+    return options.operations
+
+def bench_execute_prepared(options, connection):
+    cursor = connection.cursor()
+    cursor.prepare("SELECT ? /* cols=i params=i */")
+
+    for index in range(options.operations):
+        cursor.execute_prepared((index, ))
+
+    cursor.close()
+    return options.operations
+
+def bench_fetchone(options, connection):
+    cursor = connection.cursor()
+    cursor.rowset_size = options.arraysize
+    cursor.execute(select_statement(options.rows))
+    rows = 0
+
+    while cursor.fetchone() is not None:
+        rows = rows + 1
+
+    cursor.close()
+    return rows
+
+def bench_fetchall(options, connection):
+    cursor = connection.cursor()
+    cursor.rowset_size = options.arraysize
+    cursor.execute(select_statement(options.rows))
+    rows = len(cursor.fetchall())
+    cursor.close()
+    return rows
+
+def bench_fetch_budget(options, connection):
+    cursor = connection.cursor()
+    cursor.fetch_budget = 4 * 1024 * 1024
+    cursor.execute(select_statement(options.rows))
+    rows = len(cursor.fetchall())
+    cursor.close()
+    return rows
+
+def bench_fetch_dict(options, connection):
+    cursor = connection.cursor()
+    cursor.rowset_size = options.arraysize
+    cursor.row_factory = "dict"
+    cursor.execute(select_statement(options.rows))
+    rows = len(cursor.fetchall())
+    cursor.close()
+    return rows
+
+def bench_fetch_lazy(options, connection):
+    cursor = connection.cursor()
+    cursor.rowset_size = options.arraysize
+    cursor.lazy_rows = True
+    cursor.execute(select_statement(options.rows))
+    rows = 0
+
+    for row in cursor:
+        row[0]
+        rows = rows + 1
+
+    cursor.close()
+    return rows
+
+def bench_executemany(options, connection):
+    cursor = connection.cursor()
+    cursor.paramset_size = options.arraysize
+    cursor.executemany(insert_statement, options.parameters)
+    cursor.close()
+    return len(options.parameters)
+
+def bench_executemany_pipelined(options, connection):
+    cursor = connection.cursor()
+    cursor.paramset_size = options.arraysize
+    cursor.executemany(insert_statement, options.parameters, pipelined = True)
+    cursor.close()
+    return len(options.parameters)
+
+def bench_bulk_insert(options, connection):
+    cursor = connection.cursor()
+    cursor.bulk_insert("bench /* cols=" + columns + " */", ("a", "b", "c"), options.parameters, options.arraysize)
+    cursor.close()
+    return len(options.parameters)
+
+class ByteCounter:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes = self.bytes + len(data)
+        return len(data)
+
+def bench_export_csv(options, connection):
+    cursor = connection.cursor()
+    cursor.rowset_size = options.arraysize
+    cursor.execute(select_statement(options.rows))
+    output = ByteCounter()
+    cursor.export_csv(output)
+    cursor.close()
+    return output.bytes / (1024 * 1024)
+
+benchmarks = [("connect", bench_connect, "connections"),
+              ("execute", bench_execute, "executes"),
+              ("execute_prepared", bench_execute_prepared, "executes"),
+              ("fetchone", bench_fetchone, "rows"),
+              ("fetchall", bench_fetchall, "rows"),
+              ("fetch_budget", bench_fetch_budget, "rows"),
+              ("fetch_dict", bench_fetch_dict, "rows"),
+              ("fetch_lazy", bench_fetch_lazy, "rows"),
+              ("executemany", bench_executemany, "rows"),
+              ("executemany_pipelined", bench_executemany_pipelined, "rows"),
+              ("bulk_insert", bench_bulk_insert, "rows"),
+              ("export_csv", bench_export_csv, "MB")]
+
+def measure(options, connection, function):
+    best = None
+    count = 0
+
+    for attempt in range(options.repeat):
+        started = time.perf_counter()
+        count = function(options, connection)
+        elapsed = time.perf_counter() - started
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return (best, count)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark sqlpydb against the stub ODBC driver in this directory.")
+    parser.add_argument("names", nargs = "*", help = "benchmarks to run, all of them by default")
+    parser.add_argument("--rows", type = int, default = 100000)
+    parser.add_argument("--operations", type = int, default = 2000)
+    parser.add_argument("--arraysize", type = int, default = 1024)
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--latency", type = int, default = 0, help = "simulated round trip in microseconds")
+    parser.add_argument("--output", help = "also append the results to this file")
+    options = parser.parse_args()
+
+    unknown = set(options.names) - set(name for name, function, units in benchmarks)
+
+    if unknown:
+        parser.error("unknown benchmark: " + ", ".join(sorted(unknown)))
+
+    options.connection_string = "DRIVER=stub;LATENCY=" + str(options.latency)
+    options.parameters = parameter_rows(options.rows)
+    connection = sqlpydb.connect(options.connection_string)
+    lines = []
+
+    for name, function, units in benchmarks:
+        if options.names and not name in options.names:
+            continue
+
+        elapsed, count = measure(options, connection, function)
+        line = "%-24s %12.4f s %14.1f %s/s" % (name, elapsed, count / elapsed if elapsed > 0 else 0.0, units)
+        lines.append(line)
+        print(line, flush = True)
+
+    connection.close()
+
+    if options.output:
+        with open(options.output, "a") as output:
+            output.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1916 @@
+/*
+ * odbcstub.c - a tiny in-process ODBC "driver manager" for benchmarking sqlpydb
+ *
+ * The library exports the ODBC entry points used by sqlpydb and serves
+ * synthetic result sets whose shape is taken from the statement text, so the
+ * Python side can be measured without a database.  It is built with the
+ * headers shipped in ../headers and the same 32 bit SQLLEN that sql.Driver
+ * uses by default (legacy = True).
+ *
+ * Statement text is scanned for the following keys, anything else is ignored:
+ *
+ *     rows=N          number of rows in each result set (default 1)
+ *     cols=SPEC       comma separated column types, see column_from_spec
+ *     sets=N          number of result sets produced by the statement
+ *     colsK=, rowsK=  shape and size of result set K (2, 3, ...) when it
+ *                     differs from the first
+ *     params=SPEC     parameter types reported by SQLDescribeParam
+ *     raise=STATE     fail execution with SQLSTATE STATE
+ *     raise=STATE*N   fail only the first N executions on the connection
+ *     info=TEXT       succeed with SQL_SUCCESS_WITH_INFO and message TEXT
+ *     reject=N        mark parameter set N as SQL_PARAM_ERROR
+ *     disconnect      fail with 08S01 and break the connection
+ *
+ * A SELECT without cols= echoes its parameters back as one row; a SELECT
+ * without parameters or cols= returns the driver version.  Any statement
+ * that is not a SELECT consumes its parameter sets and reports one affected
+ * row per accepted set.  CALL statements write OUTPUT and INPUT_OUTPUT
+ * parameters.
+ *
+ * Connection string keys: LATENCY=usec simulates a server round trip on
+ * every call that would reach the server, TABLES=N sizes the catalog and
+ * BULK=0 disables SQLBulkOperations.
+ *
+ * odbcstub_counter(name) and odbcstub_reset() expose call counters.
+ */
+
+typedef unsigned int DWORD;
+
+#include <sql.h>
+#include <sqlext.h>
+#include <sqlucode.h>
+
+#include <ctype.h>
+#include <stdarg.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+#define STUB_MAX_COLUMNS 512
+#define STUB_MAX_PARAMS 512
+#define STUB_MAX_DIAGS 8
+#define STUB_CELL_SIZE 16384
+
+enum { STUB_ENV = 1, STUB_DBC, STUB_STMT };
+
+enum {
+    COUNT_CONNECT,
+    COUNT_PREPARE,
+    COUNT_EXECUTE,
+    COUNT_FETCH,
+    COUNT_ROWS_FETCHED,
+    COUNT_DESCRIBE_COL,
+    COUNT_DESCRIBE_PARAM,
+    COUNT_PARAM_SETS,
+    COUNT_BULK_OPERATIONS,
+    COUNT_ROWS_ADDED,
+    COUNT_GET_DATA,
+    COUNT_CATALOG,
+    COUNT_COMMIT,
+    COUNT_ROLLBACK,
+    COUNT_ROUND_TRIPS,
+    COUNT_MAX
+};
+
+static const char *counter_names[COUNT_MAX] = {
+    "connect", "prepare", "execute", "fetch", "rows_fetched",
+    "describe_col", "describe_param", "param_sets", "bulk_operations",
+    "rows_added", "get_data", "catalog", "commit", "rollback", "round_trips"
+};
+
+static long counters[COUNT_MAX];
+
+typedef struct {
+    char state[6];
+    SQLINTEGER native;
+    char message[256];
+} diag_record;
+
+typedef struct {
+    int type;
+    int diag_count;
+    diag_record diags[STUB_MAX_DIAGS];
+} handle_header;
+
+typedef struct {
+    handle_header header;
+} stub_env;
+
+typedef struct {
+    handle_header header;
+    int connected;
+    int dead;
+    int latency;
+    int tables;
+    int bulk;
+    int failures;
+    SQLULEN autocommit;
+} stub_dbc;
+
+typedef struct {
+    char name[64];
+    SQLSMALLINT sql_type;
+    SQLULEN size;
+    SQLSMALLINT digits;
+    SQLSMALLINT nullable;
+    char kind;
+} stub_column;
+
+typedef struct {
+    SQLSMALLINT c_type;
+    SQLPOINTER value;
+    SQLLEN length;
+    SQLLEN *indicator;
+} stub_binding;
+
+typedef struct {
+    SQLSMALLINT io_type;
+    SQLSMALLINT c_type;
+    SQLSMALLINT sql_type;
+    SQLULEN size;
+    SQLPOINTER value;
+    SQLLEN length;
+    SQLLEN *indicator;
+} stub_parameter;
+
+typedef struct {
+    handle_header header;
+    stub_dbc *dbc;
+
+    char *text;
+    int is_query;
+    int is_call;
+    int prepared;
+    int open;
+
+    int column_count;
+    stub_column columns[STUB_MAX_COLUMNS];
+    int parameter_count;
+    stub_column parameter_types[STUB_MAX_PARAMS];
+    long rows;
+    int sets;
+    int set;
+    char raise_state[6];
+    int raise_times;
+    char info[128];
+    long reject;
+    int disconnect;
+
+    char **table;
+    long table_rows;
+    int echoing;
+    char *echo[STUB_MAX_PARAMS];
+
+    SQLULEN row_array_size;
+    SQLULEN *rows_fetched;
+    SQLUSMALLINT *row_status;
+    SQLULEN paramset_size;
+    SQLULEN *params_processed;
+    SQLUSMALLINT *param_status;
+    SQLULEN cursor_type;
+    SQLULEN concurrency;
+
+    stub_binding bindings[STUB_MAX_COLUMNS + 1];
+    stub_parameter parameters[STUB_MAX_PARAMS + 1];
+
+    long position;
+    long position_size;
+    long current_row;
+    int get_data_column;
+    SQLLEN get_data_offset;
+    SQLLEN rowcount;
+
+    char cell[STUB_CELL_SIZE];
+} stub_stmt;
+
+long odbcstub_counter(const char *name)
+{
+    int index;
+
+    for (index = 0; index < COUNT_MAX; index++) {
+        if (strcmp(counter_names[index], name) == 0) {
+            return __atomic_load_n(&counters[index], __ATOMIC_RELAXED);
+        }
+    }
+
+    return -1;
+}
+
+void odbcstub_reset(void)
+{
+    int index;
+
+    for (index = 0; index < COUNT_MAX; index++) {
+        __atomic_store_n(&counters[index], 0, __ATOMIC_RELAXED);
+    }
+}
+
+static void count(int counter, long amount)
+{
+    __atomic_fetch_add(&counters[counter], amount, __ATOMIC_RELAXED);
+}
+
+static void round_trip(stub_dbc *dbc)
+{
+    count(COUNT_ROUND_TRIPS, 1);
+
+    if (dbc != NULL && dbc->latency > 0) {
+        usleep(dbc->latency);
+    }
+}
+
+static void clear_diags(void *handle)
+{
+    ((handle_header *) handle)->diag_count = 0;
+}
+
+static SQLRETURN add_diag(void *handle, SQLRETURN result, const char *state, SQLINTEGER native, const char *message)
+{
+    handle_header *header = handle;
+
+    if (header->diag_count < STUB_MAX_DIAGS) {
+        diag_record *record = &header->diags[header->diag_count++];
+        snprintf(record->state, sizeof(record->state), "%s", state);
+        record->native = native;
+        snprintf(record->message, sizeof(record->message), "[sqlpydb][odbcstub]%s", message);
+    }
+
+    return result;
+}
+
+static const char *find_key(const char *text, const char *key)
+{
+    size_t key_length = strlen(key);
+    const char *found = text;
+
+    while ((found = strstr(found, key)) != NULL) {
+        if (found == text || !isalnum((unsigned char) found[-1])) {
+            return found + key_length;
+        }
+
+        found += key_length;
+    }
+
+    return NULL;
+}
+
+static long key_long(const char *text, const char *key, long missing)
+{
+    const char *value = find_key(text, key);
+    return value == NULL ? missing : strtol(value, NULL, 10);
+}
+
+static int first_word_is(const char *text, const char *word)
+{
+    size_t length = strlen(word);
+
+    while (*text != '\0' && (isspace((unsigned char) *text) || *text == '{' || *text == '(')) {
+        text++;
+    }
+
+    if (*text == '?') {
+        text++;
+
+        while (*text != '\0' && (isspace((unsigned char) *text) || *text == '=')) {
+            text++;
+        }
+    }
+
+    return strncasecmp(text, word, length) == 0 && !isalnum((unsigned char) text[length]);
+}
+
+/*
+ * Column types: i INTEGER, b BIGINT, h SMALLINT, d DOUBLE, f REAL,
+ * sN VARCHAR(N), wN WVARCHAR(N), xN VARBINARY(N), m VARCHAR(MAX),
+ * t TIMESTAMP, a DATE, n NUMERIC(18,4).  A trailing ~ marks the column
+ * nullable; every seventh value is then NULL.
+ */
+static const char *column_from_spec(const char *spec, stub_column *column)
+{
+    memset(column, 0, sizeof(*column));
+    column->kind = *spec;
+
+    switch (*spec++) {
+    case 'i': column->sql_type = SQL_INTEGER; column->size = 10; break;
+    case 'b': column->sql_type = SQL_BIGINT; column->size = 19; break;
+    case 'h': column->sql_type = SQL_SMALLINT; column->size = 5; break;
+    case 'd': column->sql_type = SQL_DOUBLE; column->size = 15; break;
+    case 'f': column->sql_type = SQL_REAL; column->size = 7; break;
+    case 's': column->sql_type = SQL_VARCHAR; column->size = strtoul(spec, (char **) &spec, 10); break;
+    case 'w': column->sql_type = SQL_WVARCHAR; column->size = strtoul(spec, (char **) &spec, 10); break;
+    case 'x': column->sql_type = SQL_VARBINARY; column->size = strtoul(spec, (char **) &spec, 10); break;
+    case 'm': column->sql_type = SQL_VARCHAR; column->size = 0; break;
+    case 't': column->sql_type = SQL_TYPE_TIMESTAMP; column->size = 19; break;
+    case 'a': column->sql_type = SQL_TYPE_DATE; column->size = 10; break;
+    case 'n': column->sql_type = SQL_NUMERIC; column->size = 18; column->digits = 4; break;
+    default: return NULL;
+    }
+
+    if (*spec == '~') {
+        column->nullable = SQL_NULLABLE;
+        spec++;
+    } else {
+        column->nullable = SQL_NO_NULLS;
+    }
+
+    return spec;
+}
+
+static int columns_from_spec(const char *spec, stub_column *columns, int limit, const char *prefix)
+{
+    int count = 0;
+
+    while (spec != NULL && *spec != '\0' && !isspace((unsigned char) *spec) && count < limit) {
+        spec = column_from_spec(spec, &columns[count]);
+
+        if (spec == NULL) {
+            break;
+        }
+
+        snprintf(columns[count].name, sizeof(columns[count].name), "%s%d", prefix, count + 1);
+        count++;
+
+        if (*spec == ',') {
+            spec++;
+        }
+    }
+
+    return count;
+}
+
+static void free_table(stub_stmt *stmt)
+{
+    long index;
+
+    if (stmt->table != NULL) {
+        for (index = 0; index < stmt->table_rows * stmt->column_count; index++) {
+            free(stmt->table[index]);
+        }
+
+        free(stmt->table);
+        stmt->table = NULL;
+    }
+
+    stmt->table_rows = 0;
+
+    for (index = 0; index < STUB_MAX_PARAMS; index++) {
+        free(stmt->echo[index]);
+        stmt->echo[index] = NULL;
+    }
+}
+
+static void parse_statement(stub_stmt *stmt, const char *text, SQLINTEGER length)
+{
+    const char *value;
+    const char *cursor;
+    int index;
+
+    free(stmt->text);
+    free_table(stmt);
+
+    if (length == SQL_NTS) {
+        stmt->text = strdup(text);
+    } else {
+        stmt->text = strndup(text, length);
+    }
+
+    text = stmt->text;
+    stmt->is_query = first_word_is(text, "SELECT");
+    stmt->is_call = first_word_is(text, "CALL");
+    stmt->rows = key_long(text, "rows=", 1);
+    stmt->sets = (int) key_long(text, "sets=", 1);
+    stmt->reject = key_long(text, "reject=", -1);
+    stmt->disconnect = find_key(text, "disconnect") != NULL;
+    stmt->raise_state[0] = '\0';
+    stmt->raise_times = 0;
+    stmt->info[0] = '\0';
+
+    if ((value = find_key(text, "raise=")) != NULL) {
+        snprintf(stmt->raise_state, sizeof(stmt->raise_state), "%.5s", value);
+
+        if (value[5] == '*') {
+            stmt->raise_times = atoi(value + 6);
+        }
+    }
+
+    if ((value = find_key(text, "info=")) != NULL) {
+        for (index = 0; value[index] != '\0' && !isspace((unsigned char) value[index]) && index < 127; index++) {
+            stmt->info[index] = value[index];
+        }
+
+        stmt->info[index] = '\0';
+    }
+
+    stmt->parameter_count = 0;
+
+    for (cursor = text; *cursor != '\0'; cursor++) {
+        if (*cursor == '\'') {
+            cursor = strchr(cursor + 1, '\'');
+
+            if (cursor == NULL) {
+                break;
+            }
+        } else if (*cursor == '?' && stmt->parameter_count < STUB_MAX_PARAMS) {
+            column_from_spec("s255", &stmt->parameter_types[stmt->parameter_count]);
+            stmt->parameter_types[stmt->parameter_count].nullable = SQL_NULLABLE;
+            stmt->parameter_count++;
+        }
+    }
+
+    columns_from_spec(find_key(text, "params="), stmt->parameter_types, stmt->parameter_count, "p");
+    stmt->column_count = 0;
+    stmt->echoing = 0;
+
+    if (stmt->is_query || stmt->is_call) {
+        stmt->column_count = columns_from_spec(find_key(text, "cols="), stmt->columns, STUB_MAX_COLUMNS, "c");
+
+        if (stmt->column_count == 0 && stmt->is_query) {
+            if (stmt->parameter_count > 0) {
+                for (index = 0; index < stmt->parameter_count; index++) {
+                    column_from_spec("s255~", &stmt->columns[index]);
+                    snprintf(stmt->columns[index].name, sizeof(stmt->columns[index].name), "p%d", index + 1);
+                }
+
+                stmt->column_count = stmt->parameter_count;
+            } else {
+                column_from_spec("s64", &stmt->columns[0]);
+                snprintf(stmt->columns[0].name, sizeof(stmt->columns[0].name), "version");
+                stmt->column_count = 1;
+            }
+
+            stmt->echoing = stmt->parameter_count > 0;
+            stmt->rows = 1;
+        }
+    }
+
+    stmt->open = 0;
+    stmt->set = 0;
+    stmt->position = -1;
+    stmt->rowcount = -1;
+}
+
+static const char *synthetic_cell(stub_stmt *stmt, long row, int column_index)
+{
+    stub_column *column = &stmt->columns[column_index];
+    long value = row + 1;
+    long length;
+    long index;
+
+    if (stmt->table != NULL) {
+        return stmt->table[row * stmt->column_count + column_index];
+    }
+
+    if (stmt->rows == 1 && stmt->column_count > 0 && strcmp(stmt->columns[0].name, "version") == 0) {
+        return "sqlpydb odbcstub 1.0";
+    }
+
+    if (stmt->echoing) {
+        return stmt->echo[column_index];
+    }
+
+    if (column->nullable == SQL_NULLABLE && row % 7 == 6) {
+        return NULL;
+    }
+
+    switch (column->kind) {
+    case 'i':
+    case 'h':
+        snprintf(stmt->cell, sizeof(stmt->cell), "%ld", column->kind == 'h' ? value % 30000 : value * (column_index + 1));
+        break;
+    case 'b':
+        snprintf(stmt->cell, sizeof(stmt->cell), "%ld", value * 1000003L);
+        break;
+    case 'd':
+    case 'f':
+        snprintf(stmt->cell, sizeof(stmt->cell), "%.1f", value * 0.5);
+        break;
+    case 'n':
+        snprintf(stmt->cell, sizeof(stmt->cell), "%ld.%04ld", value, (value * 37) % 10000);
+        break;
+    case 't':
+        snprintf(stmt->cell, sizeof(stmt->cell), "2024-01-%02ld %02ld:%02ld:%02ld",
+                 1 + (row / 86400) % 28, (row / 3600) % 24, (row / 60) % 60, row % 60);
+        break;
+    case 'a':
+        snprintf(stmt->cell, sizeof(stmt->cell), "2024-%02ld-%02ld", 1 + (row / 28) % 12, 1 + row % 28);
+        break;
+    default:
+        length = snprintf(stmt->cell, sizeof(stmt->cell), "%ld:%d", value, column_index + 1);
+
+        if (column->size == 0) {
+            index = row % 4 == 3 ? 5000 : 12;
+        } else {
+            index = row % 4 == 3 ? (long) column->size : 12;
+
+            if (index > (long) column->size) {
+                index = column->size;
+            }
+        }
+
+        for (; length < index && length < STUB_CELL_SIZE - 1; length++) {
+            stmt->cell[length] = 'a' + (char) ((row + length) % 26);
+        }
+
+        stmt->cell[length < (long) column->size || column->size == 0 ? length : (long) column->size] = '\0';
+        break;
+    }
+
+    return stmt->cell;
+}
+
+static SQLLEN c_type_size(SQLSMALLINT c_type)
+{
+    switch (c_type) {
+    case SQL_C_LONG: case SQL_C_SLONG: case SQL_C_ULONG: return 4;
+    case SQL_C_SHORT: case SQL_C_SSHORT: case SQL_C_USHORT: return 2;
+    case SQL_C_SBIGINT: case SQL_C_UBIGINT: return 8;
+    case SQL_C_DOUBLE: return 8;
+    case SQL_C_FLOAT: return 4;
+    case SQL_C_TINYINT: case SQL_C_STINYINT: case SQL_C_UTINYINT: case SQL_C_BIT: return 1;
+    case SQL_C_TYPE_TIMESTAMP: return sizeof(SQL_TIMESTAMP_STRUCT);
+    case SQL_C_TYPE_DATE: return sizeof(SQL_DATE_STRUCT);
+    case SQL_C_TYPE_TIME: return sizeof(SQL_TIME_STRUCT);
+    default: return 0;
+    }
+}
+
+static SQLSMALLINT default_c_type(SQLSMALLINT sql_type)
+{
+    switch (sql_type) {
+    case SQL_INTEGER: return SQL_C_LONG;
+    case SQL_SMALLINT: return SQL_C_SHORT;
+    case SQL_BIGINT: return SQL_C_SBIGINT;
+    case SQL_DOUBLE: case SQL_FLOAT: return SQL_C_DOUBLE;
+    case SQL_REAL: return SQL_C_FLOAT;
+    case SQL_VARBINARY: case SQL_BINARY: case SQL_LONGVARBINARY: return SQL_C_BINARY;
+    case SQL_WVARCHAR: case SQL_WCHAR: case SQL_WLONGVARCHAR: return SQL_C_WCHAR;
+    default: return SQL_C_CHAR;
+    }
+}
+
+static SQLLEN element_stride(SQLSMALLINT c_type, SQLLEN length)
+{
+    SQLLEN size = c_type_size(c_type);
+    return size > 0 ? size : length;
+}
+
+/*
+ * Writes a textual cell into a bound C buffer, starting at byte offset of the
+ * source value for SQLGetData continuation.  Returns 1 when character or
+ * binary data was truncated.
+ */
+static int write_cell(const char *cell, SQLSMALLINT c_type, SQLPOINTER target, SQLLEN length, SQLLEN *indicator, SQLLEN offset)
+{
+    SQLLEN size = c_type_size(c_type);
+    SQLLEN total;
+    SQLLEN copy;
+    SQLLEN index;
+    int year = 0, month = 0, day = 0, hour = 0, minute = 0, second = 0;
+
+    if (cell == NULL) {
+        if (indicator != NULL) {
+            *indicator = SQL_NULL_DATA;
+        }
+
+        return 0;
+    }
+
+    if (size > 0 && indicator != NULL) {
+        *indicator = size;
+    }
+
+    switch (c_type) {
+    case SQL_C_LONG: case SQL_C_SLONG: case SQL_C_ULONG:
+        *(SQLINTEGER *) target = (SQLINTEGER) strtoll(cell, NULL, 10);
+        return 0;
+    case SQL_C_SHORT: case SQL_C_SSHORT: case SQL_C_USHORT:
+        *(SQLSMALLINT *) target = (SQLSMALLINT) strtol(cell, NULL, 10);
+        return 0;
+    case SQL_C_SBIGINT: case SQL_C_UBIGINT:
+        *(SQLBIGINT *) target = strtoll(cell, NULL, 10);
+        return 0;
+    case SQL_C_DOUBLE:
+        *(SQLDOUBLE *) target = strtod(cell, NULL);
+        return 0;
+    case SQL_C_FLOAT:
+        *(SQLREAL *) target = (SQLREAL) strtod(cell, NULL);
+        return 0;
+    case SQL_C_TINYINT: case SQL_C_STINYINT: case SQL_C_UTINYINT: case SQL_C_BIT:
+        *(SQLCHAR *) target = (SQLCHAR) strtol(cell, NULL, 10);
+        return 0;
+    case SQL_C_TYPE_TIMESTAMP:
+        sscanf(cell, "%d-%d-%d %d:%d:%d", &year, &month, &day, &hour, &minute, &second);
+        ((SQL_TIMESTAMP_STRUCT *) target)->year = year;
+        ((SQL_TIMESTAMP_STRUCT *) target)->month = month;
+        ((SQL_TIMESTAMP_STRUCT *) target)->day = day;
+        ((SQL_TIMESTAMP_STRUCT *) target)->hour = hour;
+        ((SQL_TIMESTAMP_STRUCT *) target)->minute = minute;
+        ((SQL_TIMESTAMP_STRUCT *) target)->second = second;
+        ((SQL_TIMESTAMP_STRUCT *) target)->fraction = 0;
+        return 0;
+    case SQL_C_TYPE_DATE:
+        sscanf(cell, "%d-%d-%d", &year, &month, &day);
+        ((SQL_DATE_STRUCT *) target)->year = year;
+        ((SQL_DATE_STRUCT *) target)->month = month;
+        ((SQL_DATE_STRUCT *) target)->day = day;
+        return 0;
+    case SQL_C_TYPE_TIME:
+        sscanf(cell, "%d:%d:%d", &hour, &minute, &second);
+        ((SQL_TIME_STRUCT *) target)->hour = hour;
+        ((SQL_TIME_STRUCT *) target)->minute = minute;
+        ((SQL_TIME_STRUCT *) target)->second = second;
+        return 0;
+    case SQL_C_WCHAR:
+        total = (SQLLEN) strlen(cell) - offset / 2;
+        total = total < 0 ? 0 : total;
+
+        if (indicator != NULL) {
+            *indicator = total * 2;
+        }
+
+        copy = length / 2 - 1;
+        copy = copy < 0 ? 0 : (copy > total ? total : copy);
+
+        for (index = 0; index < copy; index++) {
+            ((SQLWCHAR *) target)[index] = (unsigned char) cell[offset / 2 + index];
+        }
+
+        if (length >= 2) {
+            ((SQLWCHAR *) target)[copy] = 0;
+        }
+
+        return copy < total;
+    case SQL_C_BINARY:
+        total = (SQLLEN) strlen(cell) - offset;
+        total = total < 0 ? 0 : total;
+
+        if (indicator != NULL) {
+            *indicator = total;
+        }
+
+        copy = total > length ? length : total;
+        memcpy(target, cell + offset, copy);
+        return copy < total;
+    default:
+        total = (SQLLEN) strlen(cell) - offset;
+        total = total < 0 ? 0 : total;
+
+        if (indicator != NULL) {
+            *indicator = total;
+        }
+
+        if (length <= 0) {
+            return total > 0;
+        }
+
+        copy = total > length - 1 ? length - 1 : total;
+        memcpy(target, cell + offset, copy);
+        ((char *) target)[copy] = '\0';
+        return copy < total;
+    }
+}
+
+/*
+ * Reads a bound parameter (or a bound column for SQLBulkOperations) as text.
+ */
+static char *read_cell(SQLSMALLINT c_type, SQLPOINTER base, SQLLEN length, SQLLEN *indicators, SQLULEN row)
+{
+    char text[64];
+    char *value;
+    char *source;
+    SQLLEN stride = element_stride(c_type, length);
+    SQLLEN indicator = indicators == NULL ? SQL_NTS : indicators[row];
+    SQLLEN index;
+
+    if (indicator == SQL_NULL_DATA || base == NULL) {
+        return NULL;
+    }
+
+    source = (char *) base + stride * row;
+
+    switch (c_type) {
+    case SQL_C_LONG: case SQL_C_SLONG: snprintf(text, sizeof(text), "%d", *(SQLINTEGER *) source); break;
+    case SQL_C_ULONG: snprintf(text, sizeof(text), "%u", *(SQLUINTEGER *) source); break;
+    case SQL_C_SHORT: case SQL_C_SSHORT: snprintf(text, sizeof(text), "%d", *(SQLSMALLINT *) source); break;
+    case SQL_C_USHORT: snprintf(text, sizeof(text), "%u", *(SQLUSMALLINT *) source); break;
+    case SQL_C_SBIGINT: snprintf(text, sizeof(text), "%lld", (long long) *(SQLBIGINT *) source); break;
+    case SQL_C_UBIGINT: snprintf(text, sizeof(text), "%llu", (unsigned long long) *(SQLUBIGINT *) source); break;
+    case SQL_C_DOUBLE: snprintf(text, sizeof(text), "%.17g", *(SQLDOUBLE *) source); break;
+    case SQL_C_FLOAT: snprintf(text, sizeof(text), "%.9g", *(SQLREAL *) source); break;
+    case SQL_C_TINYINT: case SQL_C_STINYINT: snprintf(text, sizeof(text), "%d", *(signed char *) source); break;
+    case SQL_C_UTINYINT: case SQL_C_BIT: snprintf(text, sizeof(text), "%u", *(unsigned char *) source); break;
+    case SQL_C_WCHAR:
+        if (indicator == SQL_NTS) {
+            for (indicator = 0; ((SQLWCHAR *) source)[indicator / 2] != 0 && indicator < length; indicator += 2);
+        }
+
+        value = malloc(indicator / 2 + 1);
+
+        for (index = 0; index < indicator / 2; index++) {
+            value[index] = (char) ((SQLWCHAR *) source)[index];
+        }
+
+        value[indicator / 2] = '\0';
+        return value;
+    default:
+        if (indicator == SQL_NTS) {
+            indicator = (SQLLEN) strnlen(source, length);
+        }
+
+        if (indicator > length && length > 0) {
+            indicator = length;
+        }
+
+        return strndup(source, indicator);
+    }
+
+    return strdup(text);
+}
+
+static void write_output(stub_parameter *parameter, SQLULEN row, int number)
+{
+    char text[300];
+    char *input;
+    SQLLEN stride = element_stride(parameter->c_type, parameter->length);
+
+    if (parameter->io_type == SQL_PARAM_INPUT_OUTPUT) {
+        input = read_cell(parameter->c_type, parameter->value, parameter->length, parameter->indicator, row);
+
+        if (input == NULL) {
+            return;
+        }
+
+        if (c_type_size(parameter->c_type) > 0) {
+            snprintf(text, sizeof(text), "%lld", strtoll(input, NULL, 10) + 1);
+        } else {
+            snprintf(text, sizeof(text), "%s!", input);
+        }
+
+        free(input);
+    } else if (c_type_size(parameter->c_type) > 0) {
+        snprintf(text, sizeof(text), "%lu", (unsigned long) ((row + 1) * 10 + number));
+    } else {
+        snprintf(text, sizeof(text), "out%d", number);
+    }
+
+    write_cell(text, parameter->c_type, (char *) parameter->value + stride * row, parameter->length,
+               parameter->indicator == NULL ? NULL : &parameter->indicator[row], 0);
+}
+
+SQLRETURN SQL_API SQLAllocHandle(SQLSMALLINT HandleType, SQLHANDLE InputHandle, SQLHANDLE *OutputHandlePtr)
+{
+    handle_header *header;
+    stub_stmt *stmt;
+
+    switch (HandleType) {
+    case SQL_HANDLE_ENV:
+        header = calloc(1, sizeof(stub_env));
+        break;
+    case SQL_HANDLE_DBC:
+        header = calloc(1, sizeof(stub_dbc));
+        ((stub_dbc *) header)->bulk = 1;
+        ((stub_dbc *) header)->tables = 3;
+        break;
+    case SQL_HANDLE_STMT:
+        if (InputHandle == NULL || !((stub_dbc *) InputHandle)->connected) {
+            return SQL_INVALID_HANDLE;
+        }
+
+        stmt = calloc(1, sizeof(stub_stmt));
+        stmt->dbc = InputHandle;
+        stmt->row_array_size = 1;
+        stmt->paramset_size = 1;
+        stmt->position = -1;
+        stmt->rowcount = -1;
+        header = &stmt->header;
+        break;
+    default:
+        return SQL_ERROR;
+    }
+
+    header->type = HandleType == SQL_HANDLE_ENV ? STUB_ENV : (HandleType == SQL_HANDLE_DBC ? STUB_DBC : STUB_STMT);
+    *OutputHandlePtr = header;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLFreeHandle(SQLSMALLINT HandleType, SQLHANDLE Handle)
+{
+    if (Handle == NULL) {
+        return SQL_INVALID_HANDLE;
+    }
+
+    if (HandleType == SQL_HANDLE_STMT) {
+        free_table(Handle);
+        free(((stub_stmt *) Handle)->text);
+    }
+
+    free(Handle);
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLSetEnvAttr(SQLHENV EnvironmentHandle, SQLINTEGER Attribute, SQLPOINTER Value, SQLINTEGER StringLength)
+{
+    return EnvironmentHandle == NULL ? SQL_INVALID_HANDLE : SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLDriverConnect(SQLHDBC hdbc, SQLHWND hwnd, SQLCHAR *szConnStrIn, SQLSMALLINT cbConnStrIn,
+                                   SQLCHAR *szConnStrOut, SQLSMALLINT cbConnStrOutMax, SQLSMALLINT *pcbConnStrOut,
+                                   SQLUSMALLINT fDriverCompletion)
+{
+    stub_dbc *dbc = hdbc;
+    char *text;
+
+    if (dbc == NULL) {
+        return SQL_INVALID_HANDLE;
+    }
+
+    clear_diags(dbc);
+    text = cbConnStrIn == SQL_NTS ? strdup((char *) szConnStrIn) : strndup((char *) szConnStrIn, cbConnStrIn);
+    dbc->latency = (int) key_long(text, "LATENCY=", 0);
+    dbc->tables = (int) key_long(text, "TABLES=", 3);
+    dbc->bulk = (int) key_long(text, "BULK=", 1);
+
+    if (find_key(text, "FAIL") != NULL) {
+        free(text);
+        return add_diag(dbc, SQL_ERROR, "08001", 17, "Client unable to establish connection");
+    }
+
+    free(text);
+    count(COUNT_CONNECT, 1);
+    round_trip(dbc);
+    dbc->connected = 1;
+    dbc->autocommit = SQL_AUTOCOMMIT_ON;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLDisconnect(SQLHDBC ConnectionHandle)
+{
+    ((stub_dbc *) ConnectionHandle)->connected = 0;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLSetConnectAttr(SQLHDBC ConnectionHandle, SQLINTEGER Attribute, SQLPOINTER Value, SQLINTEGER StringLength)
+{
+    stub_dbc *dbc = ConnectionHandle;
+
+    clear_diags(dbc);
+
+    if (dbc->dead) {
+        return add_diag(dbc, SQL_ERROR, "08S01", 10054, "Communication link failure");
+    }
+
+    if (Attribute == SQL_ATTR_AUTOCOMMIT) {
+        dbc->autocommit = (SQLULEN) (size_t) Value;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetConnectAttr(SQLHDBC ConnectionHandle, SQLINTEGER Attribute, SQLPOINTER Value,
+                                    SQLINTEGER BufferLength, SQLINTEGER *StringLength)
+{
+    stub_dbc *dbc = ConnectionHandle;
+
+    clear_diags(dbc);
+
+    if (Attribute == SQL_ATTR_AUTOCOMMIT) {
+        *(SQLUINTEGER *) Value = (SQLUINTEGER) dbc->autocommit;
+    } else if (Attribute == SQL_ATTR_CONNECTION_DEAD) {
+        *(SQLUINTEGER *) Value = dbc->dead ? SQL_CD_TRUE : SQL_CD_FALSE;
+    } else {
+        *(SQLUINTEGER *) Value = 0;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLEndTran(SQLSMALLINT HandleType, SQLHANDLE Handle, SQLSMALLINT CompletionType)
+{
+    stub_dbc *dbc = Handle;
+
+    if (HandleType != SQL_HANDLE_DBC) {
+        return SQL_SUCCESS;
+    }
+
+    clear_diags(dbc);
+
+    if (dbc->dead) {
+        return add_diag(dbc, SQL_ERROR, "08S01", 10054, "Communication link failure");
+    }
+
+    round_trip(dbc);
+    count(CompletionType == SQL_COMMIT ? COUNT_COMMIT : COUNT_ROLLBACK, 1);
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetInfo(SQLHDBC ConnectionHandle, SQLUSMALLINT InfoType, SQLPOINTER InfoValue,
+                             SQLSMALLINT BufferLength, SQLSMALLINT *StringLength)
+{
+    const char *text = NULL;
+    SQLUINTEGER value = 0;
+
+    switch (InfoType) {
+    case SQL_DBMS_NAME: text = "odbcstub"; break;
+    case SQL_DBMS_VER: text = "01.00.0000"; break;
+    case SQL_DRIVER_NAME: text = "libodbc.so"; break;
+    case SQL_DRIVER_VER: text = "01.00.0000"; break;
+    case SQL_DATABASE_NAME: text = "stub"; break;
+    case SQL_SERVER_NAME: text = "localhost"; break;
+    case SQL_USER_NAME: text = "stub"; break;
+    case SQL_GETDATA_EXTENSIONS: value = SQL_GD_ANY_COLUMN | SQL_GD_ANY_ORDER | SQL_GD_BLOCK | SQL_GD_BOUND; break;
+    case SQL_STATIC_CURSOR_ATTRIBUTES1:
+    case SQL_KEYSET_CURSOR_ATTRIBUTES1:
+    case SQL_DYNAMIC_CURSOR_ATTRIBUTES1:
+        value = SQL_CA1_NEXT | SQL_CA1_ABSOLUTE | SQL_CA1_RELATIVE | SQL_CA1_POS_POSITION;
+        value |= ((stub_dbc *) ConnectionHandle)->bulk ? SQL_CA1_BULK_ADD : 0;
+        break;
+    default: break;
+    }
+
+    if (text != NULL) {
+        if (InfoValue != NULL && BufferLength > 0) {
+            snprintf(InfoValue, BufferLength, "%s", text);
+        }
+
+        if (StringLength != NULL) {
+            *StringLength = (SQLSMALLINT) strlen(text);
+        }
+    } else if (InfoValue != NULL) {
+        *(SQLUINTEGER *) InfoValue = value;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetFunctions(SQLHDBC ConnectionHandle, SQLUSMALLINT FunctionId, SQLUSMALLINT *Supported)
+{
+    int index;
+
+    if (FunctionId == SQL_API_ODBC3_ALL_FUNCTIONS) {
+        for (index = 0; index < SQL_API_ODBC3_ALL_FUNCTIONS_SIZE; index++) {
+            Supported[index] = 0xFFFF;
+        }
+
+        if (!((stub_dbc *) ConnectionHandle)->bulk) {
+            Supported[SQL_API_SQLBULKOPERATIONS >> 4] &= ~(1 << (SQL_API_SQLBULKOPERATIONS & 0x000F));
+        }
+    } else {
+        *Supported = FunctionId == SQL_API_SQLBULKOPERATIONS ? ((stub_dbc *) ConnectionHandle)->bulk != 0 : SQL_TRUE;
+    }
+
+    return SQL_SUCCESS;
+}
+
+static stub_stmt *begin(SQLHSTMT StatementHandle)
+{
+    stub_stmt *stmt = StatementHandle;
+
+    if (stmt != NULL) {
+        clear_diags(stmt);
+    }
+
+    return stmt;
+}
+
+static SQLRETURN dead_connection(stub_stmt *stmt)
+{
+    return add_diag(stmt, SQL_ERROR, "08S01", 10054, "Communication link failure");
+}
+
+SQLRETURN SQL_API SQLSetStmtAttr(SQLHSTMT StatementHandle, SQLINTEGER Attribute, SQLPOINTER Value, SQLINTEGER StringLength)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    switch (Attribute) {
+    case SQL_ATTR_ROW_ARRAY_SIZE: stmt->row_array_size = (SQLULEN) (size_t) Value; break;
+    case SQL_ATTR_ROWS_FETCHED_PTR: stmt->rows_fetched = Value; break;
+    case SQL_ATTR_ROW_STATUS_PTR: stmt->row_status = Value; break;
+    case SQL_ATTR_PARAMSET_SIZE: stmt->paramset_size = (SQLULEN) (size_t) Value; break;
+    case SQL_ATTR_PARAMS_PROCESSED_PTR: stmt->params_processed = Value; break;
+    case SQL_ATTR_PARAM_STATUS_PTR: stmt->param_status = Value; break;
+    case SQL_ATTR_CURSOR_TYPE: stmt->cursor_type = (SQLULEN) (size_t) Value; break;
+    case SQL_ATTR_CONCURRENCY: stmt->concurrency = (SQLULEN) (size_t) Value; break;
+    case SQL_ATTR_ROW_BIND_TYPE:
+    case SQL_ATTR_PARAM_BIND_TYPE:
+        if (Value != (SQLPOINTER) SQL_BIND_BY_COLUMN) {
+            return add_diag(stmt, SQL_ERROR, "HYC00", 0, "Only column-wise binding is supported");
+        }
+        break;
+    default: break;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetStmtAttr(SQLHSTMT StatementHandle, SQLINTEGER Attribute, SQLPOINTER Value,
+                                 SQLINTEGER BufferLength, SQLINTEGER *StringLength)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    switch (Attribute) {
+    case SQL_ATTR_ROW_ARRAY_SIZE: *(SQLULEN *) Value = stmt->row_array_size; break;
+    case SQL_ATTR_PARAMSET_SIZE: *(SQLULEN *) Value = stmt->paramset_size; break;
+    case SQL_ATTR_CURSOR_TYPE: *(SQLULEN *) Value = stmt->cursor_type; break;
+    case SQL_ATTR_CONCURRENCY: *(SQLULEN *) Value = stmt->concurrency; break;
+    case SQL_ATTR_ROW_NUMBER: *(SQLULEN *) Value = stmt->position < 0 ? 0 : stmt->position + 1; break;
+    default: *(SQLULEN *) Value = 0; break;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLFreeStmt(SQLHSTMT StatementHandle, SQLUSMALLINT Option)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    switch (Option) {
+    case SQL_CLOSE:
+        stmt->open = 0;
+        stmt->position = -1;
+        break;
+    case SQL_DROP:
+        return SQLFreeHandle(SQL_HANDLE_STMT, stmt);
+    case SQL_UNBIND:
+        memset(stmt->bindings, 0, sizeof(stmt->bindings));
+        break;
+    case SQL_RESET_PARAMS:
+        memset(stmt->parameters, 0, sizeof(stmt->parameters));
+        break;
+    default:
+        break;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLCloseCursor(SQLHSTMT StatementHandle)
+{
+    return SQLFreeStmt(StatementHandle, SQL_CLOSE);
+}
+
+SQLRETURN SQL_API SQLCancel(SQLHSTMT StatementHandle)
+{
+    return SQLFreeStmt(StatementHandle, SQL_CLOSE);
+}
+
+SQLRETURN SQL_API SQLPrepare(SQLHSTMT StatementHandle, SQLCHAR *StatementText, SQLINTEGER TextLength)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    if (stmt->dbc->dead) {
+        return dead_connection(stmt);
+    }
+
+    count(COUNT_PREPARE, 1);
+    parse_statement(stmt, (char *) StatementText, TextLength);
+    stmt->prepared = 1;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLNumParams(SQLHSTMT StatementHandle, SQLSMALLINT *ParameterCountPtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    *ParameterCountPtr = (SQLSMALLINT) stmt->parameter_count;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLDescribeParam(SQLHSTMT StatementHandle, SQLUSMALLINT ParameterNumber, SQLSMALLINT *DataTypePtr,
+                                   SQLULEN *ParameterSizePtr, SQLSMALLINT *DecimalDigitsPtr, SQLSMALLINT *NullablePtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    stub_column *parameter;
+
+    if (ParameterNumber < 1 || ParameterNumber > stmt->parameter_count) {
+        return add_diag(stmt, SQL_ERROR, "07009", 0, "Invalid descriptor index");
+    }
+
+    count(COUNT_DESCRIBE_PARAM, 1);
+    round_trip(stmt->dbc);
+    parameter = &stmt->parameter_types[ParameterNumber - 1];
+    *DataTypePtr = parameter->sql_type;
+    *ParameterSizePtr = parameter->size;
+    *DecimalDigitsPtr = parameter->digits;
+    *NullablePtr = SQL_NULLABLE;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLBindParameter(SQLHSTMT hstmt, SQLUSMALLINT ipar, SQLSMALLINT fParamType, SQLSMALLINT fCType,
+                                   SQLSMALLINT fSqlType, SQLULEN cbColDef, SQLSMALLINT ibScale, SQLPOINTER rgbValue,
+                                   SQLLEN cbValueMax, SQLLEN *pcbValue)
+{
+    stub_stmt *stmt = begin(hstmt);
+    stub_parameter *parameter;
+
+    if (ipar < 1 || ipar > STUB_MAX_PARAMS) {
+        return add_diag(stmt, SQL_ERROR, "07009", 0, "Invalid descriptor index");
+    }
+
+    parameter = &stmt->parameters[ipar];
+    parameter->io_type = fParamType;
+    parameter->c_type = fCType == SQL_C_DEFAULT ? default_c_type(fSqlType) : fCType;
+    parameter->sql_type = fSqlType;
+    parameter->size = cbColDef;
+    parameter->value = rgbValue;
+    parameter->length = cbValueMax;
+    parameter->indicator = pcbValue;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLNumResultCols(SQLHSTMT StatementHandle, SQLSMALLINT *ColumnCountPtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    *ColumnCountPtr = (SQLSMALLINT) (stmt->is_query || stmt->table != NULL || stmt->is_call ? stmt->column_count : 0);
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLDescribeCol(SQLHSTMT StatementHandle, SQLUSMALLINT ColumnNumber, SQLCHAR *ColumnName,
+                                 SQLSMALLINT BufferLength, SQLSMALLINT *NameLengthPtr, SQLSMALLINT *DataTypePtr,
+                                 SQLULEN *ColumnSizePtr, SQLSMALLINT *DecimalDigitsPtr, SQLSMALLINT *NullablePtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    stub_column *column;
+
+    if (ColumnNumber < 1 || ColumnNumber > stmt->column_count) {
+        return add_diag(stmt, SQL_ERROR, "07009", 0, "Invalid descriptor index");
+    }
+
+    count(COUNT_DESCRIBE_COL, 1);
+    round_trip(stmt->dbc);
+    column = &stmt->columns[ColumnNumber - 1];
+
+    if (ColumnName != NULL && BufferLength > 0) {
+        snprintf((char *) ColumnName, BufferLength, "%s", column->name);
+    }
+
+    if (NameLengthPtr != NULL) {
+        *NameLengthPtr = (SQLSMALLINT) strlen(column->name);
+    }
+
+    *DataTypePtr = column->sql_type;
+    *ColumnSizePtr = column->size;
+    *DecimalDigitsPtr = column->digits;
+    *NullablePtr = column->nullable;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLColAttribute(SQLHSTMT StatementHandle, SQLUSMALLINT ColumnNumber, SQLUSMALLINT FieldIdentifier,
+                                  SQLPOINTER CharacterAttributePtr, SQLSMALLINT BufferLength,
+                                  SQLSMALLINT *StringLengthPtr, SQLLEN *NumericAttributePtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    stub_column *column;
+
+    if (ColumnNumber < 1 || ColumnNumber > stmt->column_count) {
+        return add_diag(stmt, SQL_ERROR, "07009", 0, "Invalid descriptor index");
+    }
+
+    column = &stmt->columns[ColumnNumber - 1];
+
+    switch (FieldIdentifier) {
+    case SQL_DESC_NAME:
+    case SQL_DESC_LABEL:
+        if (CharacterAttributePtr != NULL && BufferLength > 0) {
+            snprintf(CharacterAttributePtr, BufferLength, "%s", column->name);
+        }
+
+        if (StringLengthPtr != NULL) {
+            *StringLengthPtr = (SQLSMALLINT) strlen(column->name);
+        }
+
+        break;
+    case SQL_DESC_OCTET_LENGTH:
+    case SQL_DESC_LENGTH:
+    case SQL_DESC_DISPLAY_SIZE:
+        *NumericAttributePtr = (SQLLEN) column->size;
+        break;
+    case SQL_DESC_CONCISE_TYPE:
+    case SQL_DESC_TYPE:
+        *NumericAttributePtr = column->sql_type;
+        break;
+    default:
+        *NumericAttributePtr = 0;
+        break;
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLBindCol(SQLHSTMT StatementHandle, SQLUSMALLINT ColumnNumber, SQLSMALLINT TargetType,
+                             SQLPOINTER TargetValuePtr, SQLLEN BufferLength, SQLLEN *StrLen_or_IndPtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    stub_binding *binding;
+
+    if (ColumnNumber > STUB_MAX_COLUMNS) {
+        return add_diag(stmt, SQL_ERROR, "07009", 0, "Invalid descriptor index");
+    }
+
+    binding = &stmt->bindings[ColumnNumber];
+    binding->c_type = TargetType;
+    binding->value = TargetValuePtr;
+    binding->length = BufferLength;
+    binding->indicator = StrLen_or_IndPtr;
+    return SQL_SUCCESS;
+}
+
+static SQLRETURN execute(stub_stmt *stmt)
+{
+    stub_dbc *dbc = stmt->dbc;
+    stub_parameter *parameter;
+    SQLULEN row;
+    SQLULEN accepted = 0;
+    int index;
+    char *value;
+    SQLRETURN result = SQL_SUCCESS;
+
+    if (dbc->dead) {
+        return dead_connection(stmt);
+    }
+
+    count(COUNT_EXECUTE, 1);
+    round_trip(dbc);
+    free_table(stmt);
+
+    if (stmt->disconnect) {
+        dbc->dead = 1;
+        return dead_connection(stmt);
+    }
+
+    if (stmt->raise_state[0] != '\0' && (stmt->raise_times == 0 || dbc->failures < stmt->raise_times)) {
+        dbc->failures++;
+        return add_diag(stmt, SQL_ERROR, stmt->raise_state, 1205, "Simulated failure");
+    }
+
+    for (index = 1; index <= stmt->parameter_count; index++) {
+        if (stmt->parameters[index].io_type == 0) {
+            return add_diag(stmt, SQL_ERROR, "07002", 0, "COUNT field incorrect");
+        }
+    }
+
+    for (row = 0; row < stmt->paramset_size; row++) {
+        for (index = 1; index <= stmt->parameter_count; index++) {
+            parameter = &stmt->parameters[index];
+
+            if (parameter->io_type == SQL_PARAM_OUTPUT) {
+                continue;
+            }
+
+            value = read_cell(parameter->c_type, parameter->value, parameter->length, parameter->indicator, row);
+
+            if (row == 0 && stmt->echoing && stmt->echo[index - 1] == NULL) {
+                stmt->echo[index - 1] = value;
+            } else {
+                free(value);
+            }
+        }
+
+        if (stmt->param_status != NULL) {
+            stmt->param_status[row] = (long) row == stmt->reject ? SQL_PARAM_ERROR : SQL_PARAM_SUCCESS;
+        }
+
+        if ((long) row == stmt->reject) {
+            result = add_diag(stmt, SQL_SUCCESS_WITH_INFO, "23000", 2627, "Violation of constraint");
+            continue;
+        }
+
+        accepted++;
+
+        if (stmt->is_call) {
+            for (index = 1; index <= stmt->parameter_count; index++) {
+                parameter = &stmt->parameters[index];
+
+                if (parameter->io_type == SQL_PARAM_OUTPUT || parameter->io_type == SQL_PARAM_INPUT_OUTPUT) {
+                    write_output(parameter, row, index);
+                }
+            }
+        }
+    }
+
+    count(COUNT_PARAM_SETS, stmt->paramset_size);
+
+    if (stmt->params_processed != NULL) {
+        *stmt->params_processed = stmt->paramset_size;
+    }
+
+    if (accepted == 0 && stmt->paramset_size > 0 && stmt->reject >= 0) {
+        return SQL_ERROR;
+    }
+
+    if (stmt->info[0] != '\0') {
+        result = add_diag(stmt, SQL_SUCCESS_WITH_INFO, "01000", 0, stmt->info);
+    }
+
+    if (stmt->set > 0) {
+        stmt->rows = key_long(stmt->text, "rows=", 1);
+
+        if (find_key(stmt->text, "cols=") != NULL) {
+            stmt->column_count = columns_from_spec(find_key(stmt->text, "cols="), stmt->columns, STUB_MAX_COLUMNS, "c");
+        }
+    }
+
+    stmt->set = 0;
+    stmt->position = -1;
+    stmt->current_row = -1;
+    stmt->open = stmt->column_count > 0;
+    stmt->rowcount = stmt->is_query ? -1 : (SQLLEN) accepted;
+    return result;
+}
+
+SQLRETURN SQL_API SQLExecute(SQLHSTMT StatementHandle)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    if (!stmt->prepared) {
+        return add_diag(stmt, SQL_ERROR, "HY010", 0, "Function sequence error");
+    }
+
+    return execute(stmt);
+}
+
+SQLRETURN SQL_API SQLExecDirect(SQLHSTMT StatementHandle, SQLCHAR *StatementText, SQLINTEGER TextLength)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    if (stmt->dbc->dead) {
+        return dead_connection(stmt);
+    }
+
+    parse_statement(stmt, (char *) StatementText, TextLength);
+    stmt->prepared = 0;
+    return execute(stmt);
+}
+
+SQLRETURN SQL_API SQLRowCount(SQLHSTMT StatementHandle, SQLLEN *RowCountPtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    *RowCountPtr = stmt->rowcount;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLMoreResults(SQLHSTMT StatementHandle)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    round_trip(stmt->dbc);
+
+    if (stmt->open && stmt->set + 1 < stmt->sets) {
+        char key[24];
+
+        stmt->set++;
+        stmt->position = -1;
+        stmt->current_row = -1;
+        snprintf(key, sizeof(key), "cols%d=", stmt->set + 1);
+
+        if (find_key(stmt->text, key) != NULL) {
+            stmt->column_count = columns_from_spec(find_key(stmt->text, key), stmt->columns, STUB_MAX_COLUMNS, "c");
+        }
+
+        snprintf(key, sizeof(key), "rows%d=", stmt->set + 1);
+        stmt->rows = key_long(stmt->text, key, stmt->rows);
+        return SQL_SUCCESS;
+    }
+
+    stmt->open = 0;
+    return SQL_NO_DATA;
+}
+
+static long result_rows(stub_stmt *stmt)
+{
+    return stmt->table != NULL ? stmt->table_rows : stmt->rows;
+}
+
+SQLRETURN SQL_API SQLFetchScroll(SQLHSTMT StatementHandle, SQLSMALLINT FetchOrientation, SQLLEN FetchOffset)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    stub_binding *binding;
+    long rows;
+    long start;
+    long fetched;
+    long row;
+    int index;
+    int truncated;
+    int any_truncated = 0;
+    SQLULEN size = stmt->row_array_size;
+
+    if (stmt->dbc->dead) {
+        return dead_connection(stmt);
+    }
+
+    if (!stmt->open) {
+        return add_diag(stmt, SQL_ERROR, "24000", 0, "Invalid cursor state");
+    }
+
+    if (stmt->cursor_type == SQL_CURSOR_FORWARD_ONLY && FetchOrientation != SQL_FETCH_NEXT) {
+        return add_diag(stmt, SQL_ERROR, "HY106", 0, "Fetch type out of range");
+    }
+
+    count(COUNT_FETCH, 1);
+    round_trip(stmt->dbc);
+    rows = result_rows(stmt);
+
+    switch (FetchOrientation) {
+    case SQL_FETCH_NEXT: start = stmt->position < 0 ? 0 : stmt->position + stmt->position_size; break;
+    case SQL_FETCH_FIRST: start = 0; break;
+    case SQL_FETCH_LAST: start = rows - (long) size < 0 ? 0 : rows - (long) size; break;
+    case SQL_FETCH_PRIOR: start = stmt->position < 0 ? -1 : stmt->position - (long) size; break;
+    case SQL_FETCH_ABSOLUTE: start = FetchOffset > 0 ? FetchOffset - 1 : (FetchOffset < 0 ? rows + FetchOffset : -1); break;
+    case SQL_FETCH_RELATIVE: start = stmt->position < 0 ? FetchOffset - 1 : stmt->position + FetchOffset; break;
+    default: return add_diag(stmt, SQL_ERROR, "HY106", 0, "Fetch type out of range");
+    }
+
+    if (start < 0 || start >= rows) {
+        stmt->position = start < 0 ? -1 : rows;
+        stmt->current_row = -1;
+
+        if (stmt->rows_fetched != NULL) {
+            *stmt->rows_fetched = 0;
+        }
+
+        return SQL_NO_DATA;
+    }
+
+    fetched = rows - start < (long) size ? rows - start : (long) size;
+    stmt->position = start;
+    stmt->position_size = (long) size;
+    stmt->current_row = start;
+    stmt->get_data_column = 0;
+    stmt->get_data_offset = 0;
+
+    for (row = 0; row < (long) size; row++) {
+        truncated = 0;
+
+        if (row < fetched) {
+            for (index = 1; index <= stmt->column_count; index++) {
+                binding = &stmt->bindings[index];
+
+                if (binding->value == NULL && binding->indicator == NULL) {
+                    continue;
+                }
+
+                truncated |= write_cell(synthetic_cell(stmt, start + row, index - 1), binding->c_type,
+                                        (char *) binding->value + element_stride(binding->c_type, binding->length) * row,
+                                        binding->length,
+                                        binding->indicator == NULL ? NULL : &binding->indicator[row], 0);
+            }
+        }
+
+        any_truncated |= truncated;
+
+        if (stmt->row_status != NULL) {
+            stmt->row_status[row] = row < fetched ? (truncated ? SQL_ROW_SUCCESS_WITH_INFO : SQL_ROW_SUCCESS) : SQL_ROW_NOROW;
+        }
+    }
+
+    count(COUNT_ROWS_FETCHED, fetched);
+
+    if (stmt->rows_fetched != NULL) {
+        *stmt->rows_fetched = (SQLULEN) fetched;
+    }
+
+    if (any_truncated) {
+        return add_diag(stmt, SQL_SUCCESS_WITH_INFO, "01004", 0, "String data, right truncated");
+    }
+
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLFetch(SQLHSTMT StatementHandle)
+{
+    return SQLFetchScroll(StatementHandle, SQL_FETCH_NEXT, 0);
+}
+
+SQLRETURN SQL_API SQLSetPos(SQLHSTMT StatementHandle, SQLSETPOSIROW RowNumber, SQLUSMALLINT Operation, SQLUSMALLINT LockType)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+
+    if (stmt->position < 0) {
+        return add_diag(stmt, SQL_ERROR, "24000", 0, "Invalid cursor state");
+    }
+
+    if (Operation == SQL_POSITION) {
+        stmt->current_row = stmt->position + (RowNumber > 0 ? RowNumber - 1 : 0);
+        stmt->get_data_column = 0;
+        stmt->get_data_offset = 0;
+        return SQL_SUCCESS;
+    }
+
+    round_trip(stmt->dbc);
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetData(SQLHSTMT StatementHandle, SQLUSMALLINT ColumnNumber, SQLSMALLINT TargetType,
+                             SQLPOINTER TargetValuePtr, SQLLEN BufferLength, SQLLEN *StrLen_or_IndPtr)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    const char *cell;
+    SQLSMALLINT c_type;
+    SQLLEN consumed;
+    int truncated;
+
+    if (stmt->current_row < 0 || stmt->current_row >= result_rows(stmt)) {
+        return add_diag(stmt, SQL_ERROR, "24000", 0, "Invalid cursor state");
+    }
+
+    if (ColumnNumber < 1 || ColumnNumber > stmt->column_count) {
+        return add_diag(stmt, SQL_ERROR, "07009", 0, "Invalid descriptor index");
+    }
+
+    if (stmt->get_data_column != ColumnNumber) {
+        stmt->get_data_column = ColumnNumber;
+        stmt->get_data_offset = 0;
+    } else if (stmt->get_data_offset < 0) {
+        return SQL_NO_DATA;
+    }
+
+    count(COUNT_GET_DATA, 1);
+    cell = synthetic_cell(stmt, stmt->current_row, ColumnNumber - 1);
+    c_type = TargetType == SQL_C_DEFAULT ? default_c_type(stmt->columns[ColumnNumber - 1].sql_type) : TargetType;
+    truncated = write_cell(cell, c_type, TargetValuePtr, BufferLength, StrLen_or_IndPtr, stmt->get_data_offset);
+
+    if (truncated) {
+        consumed = c_type == SQL_C_BINARY ? BufferLength : (c_type == SQL_C_WCHAR ? BufferLength - 2 : BufferLength - 1);
+        stmt->get_data_offset += consumed;
+        return add_diag(stmt, SQL_SUCCESS_WITH_INFO, "01004", 0, "String data, right truncated");
+    }
+
+    stmt->get_data_offset = -1;
+    return SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLBulkOperations(SQLHSTMT StatementHandle, SQLSMALLINT Operation)
+{
+    stub_stmt *stmt = begin(StatementHandle);
+    stub_binding *binding;
+    SQLULEN row;
+    int index;
+    char *value;
+
+    if (!stmt->dbc->bulk) {
+        return add_diag(stmt, SQL_ERROR, "IM001", 0, "Driver does not support this function");
+    }
+
+    if (Operation != SQL_ADD) {
+        return add_diag(stmt, SQL_ERROR, "HYC00", 0, "Optional feature not implemented");
+    }
+
+    if (!stmt->open) {
+        return add_diag(stmt, SQL_ERROR, "24000", 0, "Invalid cursor state");
+    }
+
+    count(COUNT_BULK_OPERATIONS, 1);
+    round_trip(stmt->dbc);
+
+    for (row = 0; row < stmt->row_array_size; row++) {
+        for (index = 1; index <= stmt->column_count; index++) {
+            binding = &stmt->bindings[index];
+
+            if (binding->value != NULL || binding->indicator != NULL) {
+                value = read_cell(binding->c_type, binding->value, binding->length, binding->indicator, row);
+                free(value);
+            }
+        }
+
+        if (stmt->row_status != NULL) {
+            stmt->row_status[row] = (long) row == stmt->reject ? SQL_ROW_ERROR : SQL_ROW_ADDED;
+        }
+    }
+
+    count(COUNT_ROWS_ADDED, stmt->row_array_size);
+    stmt->rowcount = (SQLLEN) stmt->row_array_size;
+    return SQL_SUCCESS;
+}
+
+/*
+ * Catalog result sets are materialised into stmt->table as text cells.
+ */
+static void catalog_columns(stub_stmt *stmt, const char *const *names, const char *types)
+{
+    int index;
+
+    free_table(stmt);
+    free(stmt->text);
+    stmt->text = strdup("");
+    stmt->column_count = 0;
+
+    for (index = 0; names[index] != NULL; index++) {
+        column_from_spec(types[index] == 'h' ? "h" : (types[index] == 'i' ? "i" : "s128~"), &stmt->columns[index]);
+        stmt->columns[index].nullable = SQL_NULLABLE;
+        snprintf(stmt->columns[index].name, sizeof(stmt->columns[index].name), "%s", names[index]);
+        stmt->column_count++;
+    }
+
+    stmt->is_query = 1;
+    stmt->is_call = 0;
+    stmt->parameter_count = 0;
+    stmt->table = calloc(1, sizeof(char *));
+    stmt->table_rows = 0;
+}
+
+static void catalog_row(stub_stmt *stmt, ...)
+{
+    va_list arguments;
+    int index;
+    const char *value;
+
+    stmt->table = realloc(stmt->table, sizeof(char *) * (stmt->table_rows + 1) * stmt->column_count);
+    va_start(arguments, stmt);
+
+    for (index = 0; index < stmt->column_count; index++) {
+        value = va_arg(arguments, const char *);
+        stmt->table[stmt->table_rows * stmt->column_count + index] = value == NULL ? NULL : strdup(value);
+    }
+
+    va_end(arguments);
+    stmt->table_rows++;
+}
+
+static SQLRETURN catalog_open(stub_stmt *stmt)
+{
+    count(COUNT_CATALOG, 1);
+    round_trip(stmt->dbc);
+    stmt->open = 1;
+    stmt->set = 0;
+    stmt->sets = 1;
+    stmt->position = -1;
+    stmt->current_row = -1;
+    stmt->rowcount = -1;
+    return SQL_SUCCESS;
+}
+
+static int table_matches(const char *pattern, SQLSMALLINT length, const char *name)
+{
+    char buffer[256];
+    size_t size;
+
+    if (pattern == NULL) {
+        return 1;
+    }
+
+    snprintf(buffer, sizeof(buffer), "%.*s", length == SQL_NTS ? (int) strlen(pattern) : length, pattern);
+    size = strlen(buffer);
+
+    if (size == 0 || strcmp(buffer, "%") == 0) {
+        return 1;
+    }
+
+    if (buffer[size - 1] == '%') {
+        return strncmp(buffer, name, size - 1) == 0;
+    }
+
+    return strcmp(buffer, name) == 0;
+}
+
+SQLRETURN SQL_API SQLTables(SQLHSTMT StatementHandle, SQLCHAR *CatalogName, SQLSMALLINT NameLength1,
+                            SQLCHAR *SchemaName, SQLSMALLINT NameLength2, SQLCHAR *TableName, SQLSMALLINT NameLength3,
+                            SQLCHAR *TableType, SQLSMALLINT NameLength4)
+{
+    static const char *const names[] = {"TABLE_CAT", "TABLE_SCHEM", "TABLE_NAME", "TABLE_TYPE", "REMARKS", NULL};
+    stub_stmt *stmt = begin(StatementHandle);
+    char name[32];
+    int index;
+
+    catalog_columns(stmt, names, "sssss");
+
+    for (index = 0; index < stmt->dbc->tables; index++) {
+        snprintf(name, sizeof(name), "table%05d", index);
+
+        if (table_matches((char *) TableName, NameLength3, name)) {
+            catalog_row(stmt, "stub", "dbo", name, "TABLE", NULL);
+        }
+    }
+
+    return catalog_open(stmt);
+}
+
+SQLRETURN SQL_API SQLColumns(SQLHSTMT StatementHandle, SQLCHAR *CatalogName, SQLSMALLINT NameLength1,
+                             SQLCHAR *SchemaName, SQLSMALLINT NameLength2, SQLCHAR *TableName, SQLSMALLINT NameLength3,
+                             SQLCHAR *ColumnName, SQLSMALLINT NameLength4)
+{
+    static const char *const names[] = {"TABLE_CAT", "TABLE_SCHEM", "TABLE_NAME", "COLUMN_NAME", "DATA_TYPE",
+                                        "TYPE_NAME", "COLUMN_SIZE", "BUFFER_LENGTH", "DECIMAL_DIGITS",
+                                        "NUM_PREC_RADIX", "NULLABLE", "REMARKS", "COLUMN_DEF", "SQL_DATA_TYPE",
+                                        "SQL_DATETIME_SUB", "CHAR_OCTET_LENGTH", "ORDINAL_POSITION", "IS_NULLABLE",
+                                        NULL};
+    stub_stmt *stmt = begin(StatementHandle);
+    char name[32];
+    int index;
+
+    catalog_columns(stmt, names, "ssssh" "siihhh" "ssh" "hiis");
+
+    for (index = 0; index < stmt->dbc->tables; index++) {
+        snprintf(name, sizeof(name), "table%05d", index);
+
+        if (table_matches((char *) TableName, NameLength3, name)) {
+            catalog_row(stmt, "stub", "dbo", name, "id", "4", "int", "10", "4", "0", "10", "0", NULL, NULL, "4", NULL, NULL, "1", "NO");
+            catalog_row(stmt, "stub", "dbo", name, "parent_id", "4", "int", "10", "4", "0", "10", "1", NULL, NULL, "4", NULL, NULL, "2", "YES");
+            catalog_row(stmt, "stub", "dbo", name, "name", "12", "varchar", "50", "50", NULL, NULL, "1", NULL, NULL, "12", NULL, "50", "3", "YES");
+            catalog_row(stmt, "stub", "dbo", name, "created", "93", "datetime", "23", "16", "3", NULL, "1", NULL, "getdate()", "9", "3", NULL, "4", "YES");
+        }
+    }
+
+    return catalog_open(stmt);
+}
+
+SQLRETURN SQL_API SQLPrimaryKeys(SQLHSTMT hstmt, SQLCHAR *szCatalogName, SQLSMALLINT cbCatalogName,
+                                 SQLCHAR *szSchemaName, SQLSMALLINT cbSchemaName, SQLCHAR *szTableName,
+                                 SQLSMALLINT cbTableName)
+{
+    static const char *const names[] = {"TABLE_CAT", "TABLE_SCHEM", "TABLE_NAME", "COLUMN_NAME", "KEY_SEQ", "PK_NAME", NULL};
+    stub_stmt *stmt = begin(hstmt);
+    char name[32];
+    char key[40];
+    int index;
+
+    catalog_columns(stmt, names, "sssshs");
+
+    for (index = 0; index < stmt->dbc->tables; index++) {
+        snprintf(name, sizeof(name), "table%05d", index);
+        snprintf(key, sizeof(key), "pk_%s", name);
+
+        if (table_matches((char *) szTableName, cbTableName, name)) {
+            catalog_row(stmt, "stub", "dbo", name, "id", "1", key);
+        }
+    }
+
+    return catalog_open(stmt);
+}
+
+SQLRETURN SQL_API SQLStatistics(SQLHSTMT StatementHandle, SQLCHAR *CatalogName, SQLSMALLINT NameLength1,
+                                SQLCHAR *SchemaName, SQLSMALLINT NameLength2, SQLCHAR *TableName, SQLSMALLINT NameLength3,
+                                SQLUSMALLINT Unique, SQLUSMALLINT Reserved)
+{
+    static const char *const names[] = {"TABLE_CAT", "TABLE_SCHEM", "TABLE_NAME", "NON_UNIQUE", "INDEX_QUALIFIER",
+                                        "INDEX_NAME", "TYPE", "ORDINAL_POSITION", "COLUMN_NAME", "ASC_OR_DESC",
+                                        "CARDINALITY", "PAGES", "FILTER_CONDITION", NULL};
+    stub_stmt *stmt = begin(StatementHandle);
+    char name[32];
+    char key[40];
+    int index;
+
+    catalog_columns(stmt, names, "ssshsshhssiis");
+
+    for (index = 0; index < stmt->dbc->tables; index++) {
+        snprintf(name, sizeof(name), "table%05d", index);
+        snprintf(key, sizeof(key), "pk_%s", name);
+
+        if (table_matches((char *) TableName, NameLength3, name)) {
+            catalog_row(stmt, "stub", "dbo", name, NULL, NULL, NULL, "0", NULL, NULL, NULL, "1000", "10", NULL);
+            catalog_row(stmt, "stub", "dbo", name, "0", name, key, "1", "1", "id", "A", "1000", "10", NULL);
+
+            if (Unique == SQL_INDEX_ALL) {
+                catalog_row(stmt, "stub", "dbo", name, "1", name, "ix_name", "3", "1", "name", "A", "900", "8", NULL);
+            }
+        }
+    }
+
+    return catalog_open(stmt);
+}
+
+SQLRETURN SQL_API SQLForeignKeys(SQLHSTMT hstmt, SQLCHAR *szPkCatalogName, SQLSMALLINT cbPkCatalogName,
+                                 SQLCHAR *szPkSchemaName, SQLSMALLINT cbPkSchemaName, SQLCHAR *szPkTableName,
+                                 SQLSMALLINT cbPkTableName, SQLCHAR *szFkCatalogName, SQLSMALLINT cbFkCatalogName,
+                                 SQLCHAR *szFkSchemaName, SQLSMALLINT cbFkSchemaName, SQLCHAR *szFkTableName,
+                                 SQLSMALLINT cbFkTableName)
+{
+    static const char *const names[] = {"PKTABLE_CAT", "PKTABLE_SCHEM", "PKTABLE_NAME", "PKCOLUMN_NAME",
+                                        "FKTABLE_CAT", "FKTABLE_SCHEM", "FKTABLE_NAME", "FKCOLUMN_NAME", "KEY_SEQ",
+                                        "UPDATE_RULE", "DELETE_RULE", "FK_NAME", "PK_NAME", "DEFERRABILITY", NULL};
+    stub_stmt *stmt = begin(hstmt);
+    char parent[32];
+    char child[32];
+    char key[72];
+    char primary[40];
+    int index;
+
+    catalog_columns(stmt, names, "sssssssshhhssh");
+
+    for (index = 1; index < stmt->dbc->tables; index++) {
+        snprintf(parent, sizeof(parent), "table%05d", index - 1);
+        snprintf(child, sizeof(child), "table%05d", index);
+        snprintf(key, sizeof(key), "fk_%s_%s", child, parent);
+        snprintf(primary, sizeof(primary), "pk_%s", parent);
+
+        if ((szPkTableName == NULL || table_matches((char *) szPkTableName, cbPkTableName, parent)) &&
+            (szFkTableName == NULL || table_matches((char *) szFkTableName, cbFkTableName, child))) {
+            catalog_row(stmt, "stub", "dbo", parent, "id", "stub", "dbo", child, "parent_id", "1", "1", "1", key, primary, "7");
+        }
+    }
+
+    return catalog_open(stmt);
+}
+
+static SQLSMALLINT copy_diag(handle_header *header, SQLSMALLINT RecNumber, char *state, SQLINTEGER *native,
+                             char *message, SQLSMALLINT BufferLength)
+{
+    diag_record *record = &header->diags[RecNumber - 1];
+
+    snprintf(state, 6, "%s", record->state);
+
+    if (native != NULL) {
+        *native = record->native;
+    }
+
+    if (message != NULL && BufferLength > 0) {
+        snprintf(message, BufferLength, "%s", record->message);
+    }
+
+    return (SQLSMALLINT) strlen(record->message);
+}
+
+SQLRETURN SQL_API SQLGetDiagRec(SQLSMALLINT HandleType, SQLHANDLE Handle, SQLSMALLINT RecNumber, SQLCHAR *Sqlstate,
+                                SQLINTEGER *NativeErrorPtr, SQLCHAR *MessageText, SQLSMALLINT BufferLength,
+                                SQLSMALLINT *TextLengthPtr)
+{
+    handle_header *header = Handle;
+    char state[6];
+    SQLSMALLINT length;
+
+    if (header == NULL) {
+        return SQL_INVALID_HANDLE;
+    }
+
+    if (RecNumber < 1 || RecNumber > header->diag_count) {
+        return SQL_NO_DATA;
+    }
+
+    length = copy_diag(header, RecNumber, state, NativeErrorPtr, (char *) MessageText, BufferLength);
+
+    if (Sqlstate != NULL) {
+        memcpy(Sqlstate, state, 6);
+    }
+
+    if (TextLengthPtr != NULL) {
+        *TextLengthPtr = length;
+    }
+
+    return length >= BufferLength ? SQL_SUCCESS_WITH_INFO : SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetDiagRecW(SQLSMALLINT HandleType, SQLHANDLE Handle, SQLSMALLINT RecNumber, SQLWCHAR *Sqlstate,
+                                 SQLINTEGER *NativeErrorPtr, SQLWCHAR *MessageText, SQLSMALLINT BufferLength,
+                                 SQLSMALLINT *TextLengthPtr)
+{
+    handle_header *header = Handle;
+    char state[6];
+    char message[256];
+    SQLSMALLINT length;
+    SQLSMALLINT index;
+
+    if (header == NULL) {
+        return SQL_INVALID_HANDLE;
+    }
+
+    if (RecNumber < 1 || RecNumber > header->diag_count) {
+        return SQL_NO_DATA;
+    }
+
+    length = copy_diag(header, RecNumber, state, NativeErrorPtr, message, sizeof(message));
+
+    if (Sqlstate != NULL) {
+        for (index = 0; index < 6; index++) {
+            Sqlstate[index] = (unsigned char) state[index];
+        }
+    }
+
+    if (MessageText != NULL && BufferLength > 0) {
+        for (index = 0; index < length && index < BufferLength - 1; index++) {
+            MessageText[index] = (unsigned char) message[index];
+        }
+
+        MessageText[index] = 0;
+    }
+
+    if (TextLengthPtr != NULL) {
+        *TextLengthPtr = length;
+    }
+
+    return length >= BufferLength ? SQL_SUCCESS_WITH_INFO : SQL_SUCCESS;
+}
+
+SQLRETURN SQL_API SQLGetDiagField(SQLSMALLINT HandleType, SQLHANDLE Handle, SQLSMALLINT RecNumber,
+                                  SQLSMALLINT DiagIdentifier, SQLPOINTER DiagInfoPtr, SQLSMALLINT BufferLength,
+                                  SQLSMALLINT *StringLengthPtr)
+{
+    handle_header *header = Handle;
+
+    if (header == NULL) {
+        return SQL_INVALID_HANDLE;
+    }
+
+    if (RecNumber == 0 && DiagIdentifier == SQL_DIAG_NUMBER) {
+        *(SQLINTEGER *) DiagInfoPtr = header->diag_count;
+        return SQL_SUCCESS;
+    }
+
+    if (RecNumber < 1 || RecNumber > header->diag_count) {
+        return SQL_NO_DATA;
+    }
+
+    if (DiagIdentifier == SQL_DIAG_NATIVE) {
+        *(SQLINTEGER *) DiagInfoPtr = header->diags[RecNumber - 1].native;
+        return SQL_SUCCESS;
+    }
+
+    return SQL_ERROR;
+}
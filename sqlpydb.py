@@ -1,13 +1,58 @@
 #!/usr/bin/env python3
 
+import bisect
+import collections
+import concurrent.futures
+import contextvars
+import csv
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import logging.handlers
+import marshal
+import mmap
+import queue
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
 import time
+import weakref
 
 from ctypes import *
 
 from dmsql import *
 
-def connect(connection_string):
-    return Connection(connection_string)
+import sqlpydb_arrow as arrow
+import sqlpydb_parallel as parallel
+
+def connect(connection_string, result_cache = None, retry_policy = None, query_log = None, tracer = None):
+    return Connection(connection_string, result_cache, retry_policy, query_log, tracer)
+
+default_tracer = None
+
+tracing_types = None
+
+def set_tracer(tracer):
+    global default_tracer
+    default_tracer = tracer
+
+def span_types():
+    global tracing_types
+
+    if tracing_types is None:
+        try:
+            from opentelemetry.trace import Span, SpanKind, StatusCode, Tracer
+            tracing_types = (Tracer, Span, SpanKind.CLIENT, StatusCode.ERROR, )
+        except ImportError:
+            tracing_types = (None, None, None, None, )
+
+    return tracing_types
 
 apilevel = "2.0"
 
@@ -49,8 +94,86 @@ environment_handle = SQLHANDLE()
 SQLAllocHandle(SQL_HANDLE_ENV, SQL_NULL_HANDLE, byref(environment_handle))
 SQLSetEnvAttr(environment_handle, SQL_ATTR_ODBC_VERSION, SQL_OV_ODBC3, SQL_IS_UINTEGER)
 
+wide_encoding = "utf-16-le" if sys.byteorder == "little" else "utf-16-be"
+
+def diagnostic_records(handle_type, handle):
+    try:
+        return wide_diagnostic_records(handle_type, handle)
+    except NotImplementedError:
+        return narrow_diagnostic_records(handle_type, handle)
+
+def narrow_diagnostic_records(handle_type, handle):
+    records = []
+    state = create_string_buffer(6)
+    native_error = SQLINTEGER()
+    message_size = 1024
+    message = create_string_buffer(message_size)
+    message_length = SQLSMALLINT()
+    record = 1
+
+    sr = SQLGetDiagRec(handle_type, handle, record, cast(state, POINTER(SQLCHAR)), byref(native_error), cast(message, POINTER(SQLCHAR)), message_size, byref(message_length))
+
+    while sr == SQL_SUCCESS or sr == SQL_SUCCESS_WITH_INFO:
+        records.append((state.value.decode(), native_error.value, message.value.decode(errors = "replace"), ))
+        record = record + 1
+        sr = SQLGetDiagRec(handle_type, handle, record, cast(state, POINTER(SQLCHAR)), byref(native_error), cast(message, POINTER(SQLCHAR)), message_size, byref(message_length))
+
+    return records
+
+def wide_diagnostic_records(handle_type, handle):
+    records = []
+    state = (SQLWCHAR * 6)()
+    native_error = SQLINTEGER()
+    message_size = 1024
+    message = (SQLWCHAR * message_size)()
+    message_length = SQLSMALLINT()
+    record = 1
+
+    sr = SQLGetDiagRecW(handle_type, handle, record, state, byref(native_error), message, message_size, byref(message_length))
+
+    while sr == SQL_SUCCESS or sr == SQL_SUCCESS_WITH_INFO:
+        length = min(message_length.value, message_size - 1)
+        records.append((string_at(state, 5 * sizeof(SQLWCHAR)).decode(wide_encoding),
+                        native_error.value,
+                        string_at(message, length * sizeof(SQLWCHAR)).decode(wide_encoding, "replace"), ))
+        record = record + 1
+        sr = SQLGetDiagRecW(handle_type, handle, record, state, byref(native_error), message, message_size, byref(message_length))
+
+    return records
+
 class Connection:
-    def __init__(self, connection_string):
+    definition_pattern = re.compile(r"^\s*(CREATE|ALTER|DROP|TRUNCATE|RENAME)\b", re.IGNORECASE)
+    statement_pattern = re.compile(r"^\s*(\{|(INSERT|UPDATE|DELETE|MERGE|CALL|EXEC|EXECUTE)\b)", re.IGNORECASE)
+
+    sqlstate_errors = {"01" : Warning,
+                       "07" : ProgrammingError,
+                       "08" : OperationalError,
+                       "0A" : NotSupportedError,
+                       "21" : ProgrammingError,
+                       "22" : DataError,
+                       "23" : IntegrityError,
+                       "24" : ProgrammingError,
+                       "25" : ProgrammingError,
+                       "28" : OperationalError,
+                       "34" : ProgrammingError,
+                       "3D" : ProgrammingError,
+                       "3F" : ProgrammingError,
+                       "40" : OperationalError,
+                       "40002" : IntegrityError,
+                       "42" : ProgrammingError,
+                       "44" : IntegrityError,
+                       "HY" : InternalError,
+                       "HY000" : DatabaseError,
+                       "HY001" : OperationalError,
+                       "HY008" : OperationalError,
+                       "HY013" : OperationalError,
+                       "HY014" : OperationalError,
+                       "HYC00" : NotSupportedError,
+                       "HYT00" : OperationalError,
+                       "HYT01" : OperationalError,
+                       "IM" : InterfaceError}
+
+    def __init__(self, connection_string, result_cache = None, retry_policy = None, query_log = None, tracer = None):
         self.Warning = Warning
         self.Error = Error
         self.InterfaceError = InterfaceError
@@ -62,49 +185,289 @@ class Connection:
         self.ProgrammingError = ProgrammingError
         self.NotSupportedError = NotSupportedError
         self.messages = []
+        self.collect_messages = False
         self.errorhandler = None
+        self.result_cache = result_cache
+        self.catalog = Catalog(self)
+        self.description_cache_size = 1024
+        self.parameter_descriptions = {}
+        self.column_descriptions = {}
+        self.transaction_batch = None
+        self.retry_policy = retry_policy
+        self.query_log = query_log
+        self.tracer = tracer if tracer is not None else default_tracer
+        self.span_attributes = {"db.system" : "other_sql"}
+        self.trace_statements = False
+        self.transaction_writes = False
+        self.autocommit_enabled = False
+        self.cursors = weakref.WeakSet()
+        self.connection_string = str(connection_string)
+        self.open()
+
+    def open(self):
         self.connection_handle = SQLHANDLE()
+        self.getdata_support = None
 
-        sqlchar_connection_string = cast(create_string_buffer(str(connection_string).encode()), POINTER(SQLCHAR))
+        sqlchar_connection_string = cast(create_string_buffer(self.connection_string.encode()), POINTER(SQLCHAR))
 
         if environment_handle == SQL_NULL_HENV:
+            self.connection_handle = SQL_NULL_HDBC
             raise self.InterfaceError("NO ENVIRONMENT HANDLE")
 
         sr = SQLAllocHandle(SQL_HANDLE_DBC, environment_handle, byref(self.connection_handle))
 
         if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+            self.connection_handle = SQL_NULL_HDBC
             raise self.InterfaceError("UNABLE TO ALLOC CONNECTION")
 
+        span = None if self.tracer is None else self.start_span("sqlpydb.connect")
         sr = SQLDriverConnect(self.connection_handle,
                               SQL_NULL_HANDLE,
                               sqlchar_connection_string, SQL_NTS,
                               SQL_NULL_SQLCHAR, 0, SQL_NULL_SQLSMALLINT,
                               SQL_DRIVER_NOPROMPT)
 
-        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+        if span is not None:
+            if sr == SQL_SUCCESS or sr == SQL_SUCCESS_WITH_INFO:
+                self.span_attributes = self.server_attributes()
+
+            self.end_span(span, sr, SQL_HANDLE_DBC, self.connection_handle, self.span_attributes)
+
+        try:
+            self.check(sr, "BAD CONNECTION")
+        except Error:
             SQLFreeHandle(SQL_HANDLE_DBC, self.connection_handle)
-            raise self.InterfaceError("BAD CONNECTION")
+            self.connection_handle = SQL_NULL_HDBC
+            raise
 
-        self.autocommit(False)
+        self.autocommit(self.autocommit_enabled)
+        return self
 
     def close(self):
-        SQLDisconnect(self.connection_handle)
-        SQLFreeHandle(SQL_HANDLE_DBC, self.connection_handle)
+        self.catalog.close()
+        self.disconnect()
+
+    def disconnect(self):
+        if not self.connection_handle == SQL_NULL_HDBC:
+            SQLDisconnect(self.connection_handle)
+            SQLFreeHandle(SQL_HANDLE_DBC, self.connection_handle)
+            self.connection_handle = SQL_NULL_HDBC
+
+        return self
+
+    def reconnect(self):
+        self.disconnect()
+        self.transaction_writes = False
+        self.open()
+
+        for cursor in list(self.cursors):
+            cursor.reopen()
+
+        return self
 
     def autocommit(self, autocommit):
+        self.autocommit_enabled = bool(autocommit)
+
         if autocommit:
             SQLSetConnectAttr(self.connection_handle, SQL_ATTR_AUTOCOMMIT, SQL_AUTOCOMMIT_ON, SQL_IS_INTEGER)
         else:
             SQLSetConnectAttr(self.connection_handle, SQL_ATTR_AUTOCOMMIT, SQL_AUTOCOMMIT_OFF, SQL_IS_INTEGER)
 
     def commit(self):
-        SQLEndTran(SQL_HANDLE_DBC, self.connection_handle, SQL_COMMIT)
+        self.clear_messages()
+        self.check(SQLEndTran(SQL_HANDLE_DBC, self.connection_handle, SQL_COMMIT), "UNABLE TO COMMIT")
+        self.transaction_writes = False
 
     def rollback(self):
-        SQLEndTran(SQL_HANDLE_DBC, self.connection_handle, SQL_ROLLBACK)
+        self.clear_messages()
+        self.transaction_writes = False
+        self.check(SQLEndTran(SQL_HANDLE_DBC, self.connection_handle, SQL_ROLLBACK), "UNABLE TO ROLLBACK")
+
+    def transaction(self, function, *arguments):
+        if self.retry_policy is None:
+            return self.run_transaction(function, *arguments)
+
+        return self.retry_policy.run(self, self.run_transaction, function, *arguments)
+
+    def run_transaction(self, function, *arguments):
+        try:
+            result = function(self, *arguments)
+            self.commit()
+            return result
+        except Error:
+            try:
+                self.rollback()
+            except Error:
+                pass
+
+            raise
+
+    def clear_messages(self):
+        if self.messages:
+            del self.messages[:]
+
+        return self
+
+    def check(self, sr, message):
+        if sr == SQL_SUCCESS:
+            return sr
+
+        return self.diagnose(sr, message, SQL_HANDLE_DBC, self.connection_handle, self, None)
+
+    def get_info_text(self, info_type):
+        value = create_string_buffer(256)
+        sr = SQLGetInfo(self.connection_handle, info_type, value, sizeof(value), None)
+
+        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+            return None
+
+        return value.value.decode(errors = "replace") or None
+
+    def get_info_integer(self, info_type):
+        value = SQLUINTEGER()
+        sr = SQLGetInfo(self.connection_handle, info_type, byref(value), sizeof(value), None)
+
+        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+            return None
+
+        return value.value
+
+    def getdata_extensions(self):
+        if self.getdata_support is None:
+            self.getdata_support = self.get_info_integer(SQL_GETDATA_EXTENSIONS) or 0
+
+        return self.getdata_support
+
+    def server_attributes(self):
+        attributes = {"db.system" : (self.get_info_text(SQL_DBMS_NAME) or "other_sql").lower()}
+
+        for key, info_type in (("db.name", SQL_DATABASE_NAME), ("server.address", SQL_SERVER_NAME)):
+            value = self.get_info_text(info_type)
+
+            if value is not None:
+                attributes[key] = value
+
+        return attributes
+
+    def start_span(self, name, operation = None, attributes = None):
+        span_attributes = dict(self.span_attributes)
+
+        if operation is not None:
+            span_attributes["db.statement"] = operation if self.trace_statements else QueryLog.normalize(operation)
+            words = operation.lstrip("{ ").split(None, 1)
+
+            if words:
+                span_attributes["db.operation"] = words[0].upper()
+
+        if attributes is not None:
+            span_attributes.update(attributes)
+
+        tracer_type, span_type, kind, status = span_types()
+
+        if tracer_type is None or not isinstance(self.tracer, tracer_type):
+            return self.tracer.start_span(name, attributes = span_attributes)
+
+        return self.tracer.start_span(name, kind = kind, attributes = span_attributes)
+
+    def end_span(self, span, sr, handle_type, handle, attributes = None):
+        if attributes is not None:
+            for key, value in attributes.items():
+                span.set_attribute(key, value)
+
+        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO) and (not sr == SQL_NO_DATA):
+            records = diagnostic_records(handle_type, handle)
+            span.set_attribute("error.type", self.error_class(records).__name__)
+
+            if records:
+                span.set_attribute("db.response.status_code", records[0][0])
+
+            tracer_type, span_type, kind, status = span_types()
+
+            if span_type is not None and isinstance(span, span_type):
+                span.set_status(status, records[0][2] if records else None)
+
+        span.end()
+
+    def error_class(self, records):
+        for state, native_error, text in records:
+            error_class = self.sqlstate_errors.get(state, self.sqlstate_errors.get(state[:2]))
+
+            if error_class is not None and not error_class is Warning:
+                return error_class
+
+        return DatabaseError
+
+    def diagnose(self, sr, message, handle_type, handle, owner, cursor):
+        if sr == SQL_NO_DATA:
+            return sr
 
-    def cursor(self):
-        return Cursor(self)
+        if sr == SQL_SUCCESS_WITH_INFO:
+            if owner.collect_messages:
+                owner.messages.extend((Warning, Warning(state, native_error, text), ) for state, native_error, text in diagnostic_records(handle_type, handle))
+
+            return sr
+
+        records = diagnostic_records(handle_type, handle)
+        error_class = self.error_class(records)
+        error = error_class(" ".join([message] + ["[" + state + "] (" + str(native_error) + ") " + text for state, native_error, text in records]))
+        error.sqlstate = records[0][0] if records else None
+        error.diagnostics = records
+
+        if owner.collect_messages:
+            owner.messages.append((error_class, error, ))
+
+        if owner.errorhandler is not None:
+            owner.errorhandler(self, cursor, error_class, error)
+            return sr
+
+        raise error
+
+    def cursor(self, cursor_type = "forward_only", concurrency = "read_only"):
+        self.clear_messages()
+        cursor = Cursor(self, cursor_type, concurrency)
+        self.cursors.add(cursor)
+        return cursor
+
+    def writes(self, operation):
+        return self.definition_pattern.match(operation) is not None or self.statement_pattern.match(operation) is not None
+
+    def retryable(self, operation):
+        if self.retry_policy is None or operation is None:
+            return False
+
+        return self.autocommit_enabled or not (self.transaction_writes or self.writes(operation))
+
+    def batch(self, commit_rows = None, commit_interval = None):
+        return TransactionBatch(self, commit_rows, commit_interval)
+
+    def count_rows(self, rows):
+        if self.transaction_batch is not None and rows >= 0:
+            self.transaction_batch.add_rows(rows)
+
+        return self
+
+    def remember_description(self, descriptions, operation, description):
+        if operation is None:
+            return self
+
+        if len(descriptions) >= self.description_cache_size:
+            del descriptions[next(iter(descriptions))]
+
+        descriptions[operation] = description
+        return self
+
+    def forget_descriptions(self, operation = None):
+        if operation is None:
+            self.parameter_descriptions.clear()
+            self.column_descriptions.clear()
+        else:
+            self.parameter_descriptions.pop(operation, None)
+            self.column_descriptions.pop(operation, None)
+
+            for key in [key for key in self.column_descriptions if isinstance(key, tuple) and key[0] == operation]:
+                del self.column_descriptions[key]
+
+        return self
 
     def xid(self, format_id, global_transaction_id, branch_qualifier):
         raise self.NotSupportedError("WORK IN PROGRESS")
@@ -124,29 +487,155 @@ class Connection:
     def tpc_recover(self):
         raise self.NotSupportedError("WORK IN PROGRESS")
 
+class TransactionBatch:
+    def __init__(self, connection, commit_rows = None, commit_interval = None):
+        self.connection = connection
+        self.commit_rows = commit_rows
+        self.commit_interval = commit_interval
+        self.rows = 0
+        self.total_rows = 0
+        self.commits = 0
+        self.started = time.monotonic()
+
+    def __enter__(self):
+        if self.connection.transaction_batch is not None:
+            raise self.connection.ProgrammingError("TRANSACTION BATCH ALREADY ACTIVE")
+
+        self.connection.transaction_batch = self
+        self.rows = 0
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.connection.transaction_batch = None
+
+        if exception_type is None:
+            self.commit()
+        else:
+            self.connection.rollback()
+
+        return False
+
+    def due(self):
+        if self.commit_rows is not None and self.rows >= self.commit_rows:
+            return True
+
+        return self.commit_interval is not None and time.monotonic() - self.started >= self.commit_interval
+
+    def add_rows(self, rows):
+        self.rows = self.rows + rows
+        self.total_rows = self.total_rows + rows
+
+        if self.due():
+            self.commit()
+
+        return self
+
+    def commit(self):
+        self.connection.commit()
+        self.commits = self.commits + 1
+        self.rows = 0
+        self.started = time.monotonic()
+        return self
+
+class RetryPolicy:
+    transient_states = frozenset(("40001", "40P01", "HYT00", "HYT01", "HY008"))
+
+    def __init__(self, attempts = 3, delay = 0.05, maximum_delay = 2.0, multiplier = 2.0, jitter = 0.5, transient_states = None):
+        self.attempts = attempts
+        self.delay = delay
+        self.maximum_delay = maximum_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.counters = collections.Counter()
+
+        if transient_states is not None:
+            self.transient_states = frozenset(transient_states)
+
+    def classify(self, error):
+        state = getattr(error, "sqlstate", None)
+
+        if state is None:
+            return None
+
+        if state.startswith("08"):
+            return "reconnect"
+
+        if state in self.transient_states:
+            return "retry"
+
+        return None
+
+    def backoff(self, attempt):
+        delay = min(self.maximum_delay, self.delay * self.multiplier ** attempt)
+        return delay * (1.0 - self.jitter * random.random())
+
+    def run(self, connection, function, *arguments, writes = False):
+        attempt = 0
+        action = None
+
+        while True:
+            self.counters["attempts"] += 1
+
+            try:
+                if action == "reconnect":
+                    connection.reconnect()
+                    self.counters["reconnects"] += 1
+
+                return function(*arguments)
+            except Error as error:
+                action = self.classify(error)
+
+                if action is None or (action == "reconnect" and writes):
+                    raise
+
+                self.counters[error.sqlstate] += 1
+
+                if attempt + 1 >= self.attempts:
+                    self.counters["exhausted"] += 1
+                    raise
+
+            time.sleep(self.backoff(attempt))
+            attempt = attempt + 1
+            self.counters["retries"] += 1
+
+            if action == "retry" and not connection.autocommit_enabled:
+                try:
+                    connection.rollback()
+                except Error:
+                    pass
+
 class Cursor:
-    def __init__(self, connection):
-        self.description = ""
+    def __init__(self, connection, cursor_type = "forward_only", concurrency = "read_only"):
+        self.description = None
+        self.row_factory = None
+        self.converter = None
         self.rowcount = 0
         self.arraysize = 0
         self.rownumber = 0
         self.connection = connection
         self.messages = []
+        self.collect_messages = self.connection.collect_messages
         self.lastrowid = 0
         self.errorhandler = self.connection.errorhandler
+        self.allocate_statement()
 
-        self.statement_handle = SQLHANDLE()
-
-        if self.connection.connection_handle == SQL_NULL_HDBC:
-            raise self.InterfaceError("BAD CONNECTION")
+        self.scroll_modes = {"absolute" : self.scroll_absolute,
+                             "relative" : self.scroll_relative}
 
-        sr = SQLAllocHandle(SQL_HANDLE_STMT, self.connection.connection_handle, byref(self.statement_handle))
+        self.cursor_types = {"forward_only" : SQL_CURSOR_FORWARD_ONLY,
+                             "keyset" : SQL_CURSOR_KEYSET_DRIVEN,
+                             "static" : SQL_CURSOR_STATIC,
+                             "dynamic" : SQL_CURSOR_DYNAMIC}
 
-        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
-            raise self.InterfaceError("UNABLE TO ALLOC STATEMENT")
+        self.concurrencies = {"read_only" : SQL_CONCUR_READ_ONLY,
+                              "lock" : SQL_CONCUR_LOCK,
+                              "rowver" : SQL_CONCUR_ROWVER,
+                              "values" : SQL_CONCUR_VALUES}
 
-        self.scroll_modes = {"absolute" : self.scroll_absolute,
-                             "relative" : self.scroll_relative}
+        self.parameter_directions = {"in" : SQL_PARAM_INPUT,
+                                     "out" : SQL_PARAM_OUTPUT,
+                                     "inout" : SQL_PARAM_INPUT_OUTPUT}
 
         self.sql_type_map = {SQL_DECIMAL : SQL_C_LONG,
                              SQL_INTEGER : SQL_C_LONG,
@@ -216,39 +705,293 @@ class Cursor:
                                SQL_C_BINARY : string_buffer,
                                SQL_C_GUID : string_buffer}
 
+        self.field_converters = {SQL_C_SSHORT : int,
+                                 SQL_C_USHORT : int,
+                                 SQL_C_SHORT : int,
+                                 SQL_C_SLONG : int,
+                                 SQL_C_ULONG : int,
+                                 SQL_C_LONG : int,
+                                 SQL_C_FLOAT : float,
+                                 SQL_C_DOUBLE : float,
+                                 SQL_C_BIT : int,
+                                 SQL_C_UTINYINT : int,
+                                 SQL_C_TINYINT : int,
+                                 SQL_C_SBIGINT : int,
+                                 SQL_C_UBIGINT : int}
+
         self.parameter_buffers = None
         self.result_buffers = None
 
+        self.operation = None
+        self.defines_schema = False
+        self.writes = False
+        self.prepared = False
+        self.reprepare = False
+        self.prepare_time = 0.0
+        self.query_record = None
+        self.cached_rows = None
+        self.cached_position = 0
+        self.cache_key = None
+        self.cache_tags = ()
+        self.prepared_tags = ()
+
+        self.rowset_size = 1
+        self.rowset_capacity = 1
+        self.rows_fetched = SQLULEN()
+        self.row_status = None
+        self.rowset_position = 0
+        self.result_set = 0
+        self.fetch_budget = None
+        self.minimum_fetch_size = 32
+        self.fetch_size = 1
+        self.fetch_ceiling = 1
+        self.fetch_rate = None
+        self.fetches = 0
+        self.maximum_rowset_size = 65536
+        self.block_rows = 1024
+        self.string_buffer_limit = 256
+        self.maximum_binding_size = 16 * 1024 * 1024
+        self.capped_columns = {}
+        self.pending_growth = {}
+        self.prefetch = 0
+        self.pending_rows = None
+        self.lazy_rows = False
+        self.lazy_block = None
+        self.column_index = None
+
+        self.paramset_size = 256
+        self.parameter_rows = 1
+        self.parameter_sets = 1
+        self.parameters_processed = SQLULEN()
+        self.parameter_status = None
+        self.call_directions = ()
+        self.rows_processed = 0
+        self.failed_rows = []
+
+        self.cursor_attributes = {SQL_CURSOR_KEYSET_DRIVEN : SQL_KEYSET_CURSOR_ATTRIBUTES1,
+                                  SQL_CURSOR_STATIC : SQL_STATIC_CURSOR_ATTRIBUTES1,
+                                  SQL_CURSOR_DYNAMIC : SQL_DYNAMIC_CURSOR_ATTRIBUTES1}
+
+        self.set_cursor_type(cursor_type, concurrency)
+
     def __iter__(self):
+        if self.prefetch > 0 and self.cached_rows is None and self.result_buffers:
+            yield from self.iterate_prefetched()
+            return
+
         row = self.fetchone()
 
         while row is not None:
             yield row
             row = self.fetchone()
 
-    def callproc(self, procname, *parameters):
+    def iterate_prefetched(self):
+        while self.pending_rows or self.rowset_position < self.rows_fetched.value:
+            yield self.fetchone()
+
+        blocks = queue.Queue(self.prefetch)
+        stop = threading.Event()
+        fetcher = threading.Thread(target = contextvars.copy_context().run, args = (self.prefetch_blocks, blocks, stop), daemon = True)
+        fetcher.start()
+
+        try:
+            block = blocks.get()
+
+            while isinstance(block, list):
+                self.pending_rows = collections.deque(block)
+
+                while self.pending_rows:
+                    yield self.fetchone()
+
+                block = blocks.get()
+
+            if block is not None:
+                raise block
+        finally:
+            stop.set()
+
+            while fetcher.is_alive() or not blocks.empty():
+                try:
+                    block = blocks.get(timeout = 0.1)
+                except queue.Empty:
+                    continue
+
+                if isinstance(block, list) and self.pending_rows is not None:
+                    self.pending_rows.extend(block)
+
+            fetcher.join()
+
+    def prefetch_blocks(self, blocks, stop):
+        try:
+            while not stop.is_set() and self.fetch_rowset():
+                rows_fetched = self.rows_fetched.value
+                blocks.put([self.rowset_row(position) for position in range(rows_fetched)])
+                self.rowset_position = rows_fetched
+
+            blocks.put(None)
+        except Exception as error:
+            blocks.put(error)
+
+    def call_statement(self, procname, count):
+        return "{CALL " + str(procname) + "(" + ", ".join("?" * count) + ")}"
+
+    def prepare_call(self, procname, count, directions, rows):
+        if directions is None:
+            directions = ("in", ) * count
+
+        directions = tuple(self.parameter_directions[direction] for direction in directions)
+        operation = self.call_statement(procname, count)
+
+        if self.reprepare or not (self.operation == operation and self.call_directions == directions and self.parameter_rows == rows):
+            self.prepare(operation)
+            self.call_directions = directions
+            self.bind_parameter_set(*self.create_parameter_set(rows))
+
         return self
 
+    def read_parameters(self, parameters, row = 0):
+        values = list(parameters)
+
+        for index, direction in enumerate(self.call_directions):
+            if not direction == SQL_PARAM_INPUT:
+                values[index] = self.parameter_buffers[index][3].get_value(row)
+
+        return tuple(values)
+
+    def callproc(self, procname, parameters = (), directions = None):
+        self.clear_messages()
+        parameters = tuple(parameters)
+        self.prepare_call(procname, len(parameters), directions, 1)
+        self.execute_prepared(parameters)
+        return self.read_parameters(parameters)
+
+    def callproc_many(self, procname, sequence_of_parameters, directions = None):
+        self.clear_messages()
+        batches = self.parameter_batches(sequence_of_parameters, self.paramset_size)
+        results = []
+        self.rowcount = 0
+        self.rows_processed = 0
+        self.failed_rows = []
+
+        for batch in batches:
+            self.prepare_call(procname, len(batch[0]), directions, self.paramset_size)
+            self.record_parameter_statuses(self.execute_parameter_sets(self.fill_parameter_set(self.parameter_buffers, batch), True), len(batch))
+            results.extend(self.read_parameters(parameters, row) for row, parameters in enumerate(batch))
+
+        return results
+
     def close(self):
+        self.finish_query()
+        self.connection.cursors.discard(self)
         SQLFreeHandle(SQL_HANDLE_STMT, self.statement_handle)
 
-    def create_buffer(self, c_type, size):
-        return self.buffer_creator[c_type](size)
+    def begin_query(self, execute):
+        self.finish_query()
+
+        if self.connection.query_log is not None:
+            self.query_record = QueryRecord(self.operation, self.prepare_time, execute)
+
+        self.prepare_time = 0.0
+        return self
+
+    def finish_query(self):
+        record = self.query_record
+
+        if record is not None:
+            self.query_record = None
+
+            if self.connection.query_log is not None:
+                self.connection.query_log.record(record)
+
+        return self
+
+    def finish_statement(self):
+        if not self.result_buffers:
+            self.finish_query()
+
+        return self
+
+    def start_span(self, name, attributes = None):
+        return self.connection.start_span(name, self.operation, attributes)
+
+    def end_span(self, span, sr, attributes = None):
+        self.connection.end_span(span, sr, SQL_HANDLE_STMT, self.statement_handle, attributes)
+
+    def allocate_statement(self):
+        self.statement_handle = SQLHANDLE()
+
+        if self.connection.connection_handle == SQL_NULL_HDBC:
+            raise self.connection.InterfaceError("BAD CONNECTION")
+
+        sr = SQLAllocHandle(SQL_HANDLE_STMT, self.connection.connection_handle, byref(self.statement_handle))
+
+        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+            raise self.connection.InterfaceError("UNABLE TO ALLOC STATEMENT")
+
+        return self
+
+    def reopen(self):
+        self.allocate_statement()
+        self.parameter_buffers = None
+        self.result_buffers = None
+        self.parameter_sets = 1
+        self.cached_rows = None
+        self.pending_rows = None
+        self.rows_fetched.value = 0
+        self.rowset_position = 0
+        self.result_set = 0
+        self.reprepare = self.prepared
+        return self.apply_cursor_type(self.cursor_type, self.concurrency)
+
+    def clear_messages(self):
+        if self.messages:
+            del self.messages[:]
+
+        return self
+
+    def check(self, sr, message):
+        if sr == SQL_SUCCESS:
+            return sr
+
+        return self.connection.diagnose(sr, message, SQL_HANDLE_STMT, self.statement_handle, self, self)
+
+    def create_buffer(self, c_type, size, rows = 1):
+        return self.buffer_creator[c_type](size, rows)
+
+    def set_cursor_type(self, cursor_type, concurrency = "read_only"):
+        return self.apply_cursor_type(self.cursor_types[cursor_type], self.concurrencies[concurrency])
+
+    def apply_cursor_type(self, cursor_type, concurrency):
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_CURSOR_TYPE, cursor_type, SQL_IS_UINTEGER)
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_CONCURRENCY, concurrency, SQL_IS_UINTEGER)
 
-    def set_parameters(self, parameters):
+        actual_cursor_type = SQLULEN()
+        SQLGetStmtAttr(self.statement_handle, SQL_ATTR_CURSOR_TYPE, byref(actual_cursor_type), SQL_IS_UINTEGER, None)
+        self.cursor_type = actual_cursor_type.value
+
+        actual_concurrency = SQLULEN()
+        SQLGetStmtAttr(self.statement_handle, SQL_ATTR_CONCURRENCY, byref(actual_concurrency), SQL_IS_UINTEGER, None)
+        self.concurrency = actual_concurrency.value
+        return self
+
+    def set_paramset_size(self, size):
+        if not self.parameter_sets == size:
+            SQLSetStmtAttr(self.statement_handle, SQL_ATTR_PARAMSET_SIZE, size, SQL_IS_UINTEGER)
+            self.parameter_sets = size
+
+        return self
+
+    def set_parameters(self, parameters, row = 0):
         if parameters is None:
             return self
 
         parameter_count = max(len(parameters), len(self.parameter_buffers))
 
         for index in range(parameter_count):
-            self.parameter_buffers[index][3].set_value(parameters[index])
-
-    def bind_parameter_buffers_server_type(self):
-        if self.parameter_buffers is not None:
-            return self
+            self.parameter_buffers[index][3].set_value(parameters[index], row)
 
-        self.parameter_buffers = ()
+    def describe_parameters(self):
+        descriptions = ()
         number_of_parameters = SQLSMALLINT()
         SQLNumParams(self.statement_handle, byref(number_of_parameters))
 
@@ -269,15 +1012,38 @@ class Cursor:
                              byref(decimal_digits),
                              byref(nullable))
 
-            sql_type = data_type.value
+            descriptions = descriptions + ((data_type.value, parameter_size.value, decimal_digits.value, nullable.value, ), )
+
+        return descriptions
+
+    def bind_parameter_buffers_server_type(self, rows = 1):
+        if self.parameter_buffers is not None and self.parameter_rows == rows:
+            return self
+
+        return self.bind_parameter_set(*self.create_parameter_set(rows))
+
+    def create_parameter_set(self, rows):
+        descriptions = self.connection.parameter_descriptions.get(self.operation)
+
+        if descriptions is None:
+            descriptions = self.describe_parameters()
+            self.connection.remember_description(self.connection.parameter_descriptions, self.operation, descriptions)
+
+        buffers = ()
+
+        for sql_type, size, digits, nullable in descriptions:
             c_type = self.sql_type_map[sql_type]
-            size = parameter_size.value
-            digits = decimal_digits.value
-            buffer = self.create_buffer(c_type, size)
-            self.parameter_buffers = self.parameter_buffers + ((c_type, sql_type, digits, buffer, ), )
+            buffer = self.create_buffer(c_type, size, rows)
+            buffers = buffers + ((c_type, sql_type, digits, buffer, ), )
 
+        return (buffers, (SQLUSMALLINT * rows)())
+
+    def bind_parameter_set(self, buffers, status):
+        directions = self.call_directions + (SQL_PARAM_INPUT, ) * (len(buffers) - len(self.call_directions))
+
+        for index, (c_type, sql_type, digits, buffer) in enumerate(buffers, 1):
             SQLBindParameter(self.statement_handle, index,
-                             SQL_PARAM_INPUT,
+                             directions[index - 1],
                              c_type,
                              sql_type,
                              buffer.get_size(),
@@ -285,6 +1051,12 @@ class Cursor:
                              buffer.get_reference(),
                              buffer.get_size(),
                              buffer.get_length_reference())
+
+        self.parameter_buffers = buffers
+        self.parameter_rows = len(status)
+        self.parameter_status = status
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_PARAM_STATUS_PTR, self.parameter_status, 0)
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_PARAMS_PROCESSED_PTR, byref(self.parameters_processed), 0)
         return self
 
     def bind_parameter_buffers_client_type(self, parameters):
@@ -295,6 +1067,7 @@ class Cursor:
             return self
 
         self.parameter_buffers = ()
+        self.parameter_rows = 1
         number_of_parameters = len(parameters)
 
         for index in range(number_of_parameters):
@@ -316,11 +1089,8 @@ class Cursor:
                              buffer.get_length_reference())
         return self
 
-    def bind_result_buffers(self):
-        if self.result_buffers is not None:
-            return self
-
-        self.result_buffers = ()
+    def describe_columns(self):
+        descriptions = ()
         number_of_columns = SQLSMALLINT()
         SQLNumResultCols(self.statement_handle, byref(number_of_columns))
 
@@ -346,73 +1116,1131 @@ class Cursor:
                            byref(decimal_digits),
                            byref(nullable))
 
-            sql_type = data_type.value
-            c_type = self.sql_type_map[sql_type]
-            size = column_size.value
-            digits = decimal_digits.value
-            buffer = self.create_buffer(c_type, size)
-            self.result_buffers = self.result_buffers + ((c_type, sql_type, digits, buffer, ), )
+            descriptions = descriptions + ((column_name.value.decode(), data_type.value, column_size.value, decimal_digits.value, nullable.value, ), )
 
-            SQLBindCol(self.statement_handle, index,
-                       c_type,
-                       buffer.get_reference(),
-                       buffer.get_size(),
-                       buffer.get_length_reference())
+        return descriptions
+
+    def description_key(self):
+        if self.result_set == 0 or self.operation is None:
+            return self.operation
+
+        return (self.operation, self.result_set, )
+
+    def result_descriptions(self):
+        key = self.description_key()
+        descriptions = self.connection.column_descriptions.get(key)
+
+        if descriptions is None:
+            descriptions = self.describe_columns()
+            self.connection.remember_description(self.connection.column_descriptions, key, descriptions)
+
+        return descriptions
+
+    def bind_result_set(self):
+        descriptions = self.result_descriptions()
+
+        if not self.result_buffers or not len(self.result_buffers) == len(descriptions):
+            return self.rebind_result_buffers()
+
+        capped_columns = {}
+
+        for index, ((c_type, sql_type, digits, buffer), (name, described_type, size, described_digits, nullable)) in enumerate(zip(self.result_buffers, descriptions)):
+            if not c_type == self.sql_type_map[described_type]:
+                return self.rebind_result_buffers()
+
+            if buffer.element_size(self.bound_size(c_type, size)) > buffer.buffer_size:
+                return self.rebind_result_buffers()
+
+            if isinstance(buffer, string_buffer) and (size <= 0 or buffer.element_size(size) > buffer.buffer_size):
+                capped_columns[index] = size
 
+        self.result_buffers = tuple((self.sql_type_map[description[1]], description[1], description[3], column[3], ) for column, description in zip(self.result_buffers, descriptions))
+        self.column_index = None
+        self.capped_columns = capped_columns
+        self.pending_growth = {}
+        self.describe_result(descriptions)
+        self.rows_fetched.value = 0
+        self.rowset_position = 0
+        self.rownumber = 0
+        self.lazy_block = None
         return self
 
-    def prepare(self, operation):
-        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+    def rebind_result_buffers(self):
         SQLFreeStmt(self.statement_handle, SQL_UNBIND)
-        SQLFreeStmt(self.statement_handle, SQL_RESET_PARAMS)
-        self.parameter_buffers = None
         self.result_buffers = None
-        sqlchar_operation = cast(create_string_buffer(str(operation).encode()), POINTER(SQLCHAR))
-        SQLPrepare(self.statement_handle, sqlchar_operation, SQL_NTS)
-        self.bind_parameter_buffers_server_type()
-        return self
+        return self.bind_result_buffers()
 
-    def execute_prepared(self, parameters = None):
-        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
-        self.set_parameters(parameters)
-        SQLExecute(self.statement_handle)
-        self.bind_result_buffers()
-        return self
+    def bind_blocks(self):
+        if self.fetch_budget is not None or self.rowset_capacity >= self.block_rows or self.rownumber > 0 or self.rows_fetched.value > 0:
+            return self
 
-    def execute_language(self, operation, parameters = None):
-        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+        previous_rowset_size = self.rowset_size
+        self.rowset_size = self.block_rows
+
+        try:
+            return self.rebind_result_buffers()
+        finally:
+            self.rowset_size = previous_rowset_size
+
+    def read_rowcount(self):
+        row_count = SQLLEN()
+        SQLRowCount(self.statement_handle, byref(row_count))
+        self.rowcount = row_count.value
+
+        if self.result_buffers:
+            return self
+
+        if row_count.value > 0 and self.query_record is not None:
+            self.query_record.rows = self.query_record.rows + row_count.value
+
+        self.connection.count_rows(row_count.value)
+        return self
+
+    def bind_result_buffers(self):
+        if self.result_buffers is not None:
+            return self
+
+        descriptions = self.result_descriptions()
+        self.result_buffers = ()
+        self.column_index = None
+        self.capped_columns = {}
+        self.pending_growth = {}
+        self.describe_result(descriptions)
+
+        if self.fetch_budget is not None and descriptions:
+            self.size_rowset(descriptions)
+        else:
+            self.rowset_capacity = self.rowset_size
+            self.fetch_size = self.rowset_size
+
+        for index, (name, sql_type, size, digits, nullable) in enumerate(descriptions, 1):
+            c_type = self.sql_type_map[sql_type]
+            bound_size = self.bound_size(c_type, size)
+
+            if not bound_size == size:
+                self.capped_columns[index - 1] = size
+
+            buffer = self.create_buffer(c_type, bound_size, self.rowset_capacity)
+            self.result_buffers = self.result_buffers + ((c_type, sql_type, digits, buffer, ), )
+
+            SQLBindCol(self.statement_handle, index,
+                       c_type,
+                       buffer.get_reference(),
+                       buffer.get_size(),
+                       buffer.get_length_reference())
+
+        self.row_status = (SQLUSMALLINT * self.rowset_capacity)()
+        self.rows_fetched.value = 0
+        self.rowset_position = 0
+        self.rownumber = 0
+
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_ROW_ARRAY_SIZE, self.fetch_size, SQL_IS_UINTEGER)
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_ROW_STATUS_PTR, self.row_status, 0)
+        SQLSetStmtAttr(self.statement_handle, SQL_ATTR_ROWS_FETCHED_PTR, byref(self.rows_fetched), 0)
+
+        return self
+
+    def size_rowset(self, descriptions):
+        row_width = 0
+
+        for name, sql_type, size, digits, nullable in descriptions:
+            c_type = self.sql_type_map[sql_type]
+            row_width = row_width + self.buffer_creator[c_type].element_size(self.bound_size(c_type, size)) + sizeof(SQLLEN)
+
+        self.rowset_capacity = max(1, min(self.fetch_budget // row_width, self.maximum_rowset_size))
+        self.fetch_size = min(self.rowset_capacity, self.minimum_fetch_size)
+        self.fetch_ceiling = self.rowset_capacity
+        self.fetch_rate = None
+        self.fetches = 0
+        return self
+
+    def bound_size(self, c_type, size):
+        if self.string_buffer_limit is None or not self.buffer_creator[c_type] is string_buffer or not self.truncation_recoverable():
+            return size
+
+        if size <= 0 or size >= self.string_buffer_limit:
+            return self.string_buffer_limit - 1
+
+        return size
+
+    def truncation_recoverable(self):
+        extensions = self.connection.getdata_extensions()
+
+        if not extensions & SQL_GD_BOUND:
+            return False
+
+        return (extensions & SQL_GD_BLOCK) != 0 or (self.fetch_budget is None and self.rowset_size <= 1)
+
+    def complete_truncated(self):
+        rows_fetched = self.rows_fetched.value
+
+        for index in self.capped_columns:
+            buffer = self.result_buffers[index][3]
+            buffer.overflow = None
+            lengths = buffer.length[0:rows_fetched]
+
+            if not lengths or (max(lengths) < buffer.buffer_size and not SQL_NO_TOTAL in lengths):
+                continue
+
+            buffer.overflow = {}
+            needed = 0
+
+            for row, length in enumerate(lengths):
+                if length == SQL_NO_TOTAL or length >= buffer.buffer_size:
+                    value = self.get_data(row, index)
+
+                    if value is not None:
+                        buffer.overflow[row] = value.decode()
+                        needed = max(needed, len(value))
+
+            self.pending_growth[index] = max(needed, self.pending_growth.get(index, 0))
+
+        return self
+
+    def get_data(self, row, index):
+        sr = SQL_SUCCESS
+
+        if self.rows_fetched.value > 1:
+            sr = SQLSetPos(self.statement_handle, row + 1, SQL_POSITION, SQL_LOCK_NO_CHANGE)
+
+        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+            raise self.connection.DataError("STRING DATA RIGHT TRUNCATION: UNABLE TO POSITION ON ROW " + str(row + 1))
+
+        chunk_size = 8192
+        chunk = create_string_buffer(chunk_size)
+        indicator = SQLLEN()
+        parts = []
+
+        while True:
+            sr = SQLGetData(self.statement_handle, index + 1, SQL_C_CHAR, chunk, chunk_size, byref(indicator))
+
+            if sr == SQL_NO_DATA:
+                break
+
+            if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+                raise self.connection.DataError("STRING DATA RIGHT TRUNCATION: UNABLE TO READ COLUMN " + str(index + 1))
+
+            if indicator.value == SQL_NULL_DATA:
+                return None
+
+            if sr == SQL_SUCCESS or 0 <= indicator.value < chunk_size:
+                parts.append(chunk.raw[:indicator.value] if indicator.value >= 0 else chunk.value)
+                break
+
+            parts.append(chunk.raw[:chunk_size - 1])
+
+        return b"".join(parts)
+
+    def grow_bindings(self):
+        limit = (self.maximum_binding_size if self.fetch_budget is None else self.fetch_budget) // self.rowset_capacity
+
+        for index, needed in self.pending_growth.items():
+            buffer = self.result_buffers[index][3]
+            size = buffer.buffer_size
+
+            while size <= needed:
+                size = size * 2
+
+            described = self.capped_columns[index]
+
+            if described > 0 and size > described:
+                size = described
+
+            if size > limit:
+                size = limit
+            elif size == described:
+                del self.capped_columns[index]
+
+            if size < buffer.buffer_size:
+                continue
+
+            self.rebind_column(index, size)
+
+        self.pending_growth = {}
+        return self
+
+    def rebind_column(self, index, size):
+        c_type, sql_type, digits, buffer = self.result_buffers[index]
+        buffer = self.create_buffer(c_type, size, self.rowset_capacity)
+        self.result_buffers = self.result_buffers[:index] + ((c_type, sql_type, digits, buffer, ), ) + self.result_buffers[index + 1:]
+
+        SQLBindCol(self.statement_handle, index + 1,
+                   c_type,
+                   buffer.get_reference(),
+                   buffer.get_size(),
+                   buffer.get_length_reference())
+
+        return self
+
+    def adapt_fetch_size(self, elapsed):
+        fetch_size = self.fetch_size
+        self.fetches = self.fetches + 1
+
+        if self.fetches == 1 or not self.rows_fetched.value == fetch_size:
+            return self
+
+        rate = fetch_size / elapsed if elapsed > 0 else float("inf")
+
+        if self.fetch_rate is None or rate >= self.fetch_rate * 0.9:
+            fetch_size = min(self.fetch_ceiling, fetch_size * 2)
+        elif rate < self.fetch_rate * 0.7:
+            fetch_size = max(min(self.minimum_fetch_size, self.rowset_capacity), fetch_size // 2)
+            self.fetch_ceiling = fetch_size
+
+        self.fetch_rate = rate
+
+        if not fetch_size == self.fetch_size:
+            SQLSetStmtAttr(self.statement_handle, SQL_ATTR_ROW_ARRAY_SIZE, fetch_size, SQL_IS_UINTEGER)
+            self.fetch_size = fetch_size
+
+        return self
+
+    def describe_result(self, descriptions):
+        self.converter = None
+
+        if not descriptions:
+            self.description = None
+            return self
+
+        null_ok = {SQL_NO_NULLS : False, SQL_NULLABLE : True}
+        self.description = tuple((name, sql_type, None, size, size, digits, null_ok.get(nullable), ) for name, sql_type, size, digits, nullable in descriptions)
+        return self
+
+    def row_converter(self):
+        if self.converter is None or self.converter[0] is not self.row_factory:
+            self.converter = (self.row_factory, self.build_row_converter(self.row_factory), )
+
+        return self.converter[1]
+
+    def build_row_converter(self, row_factory):
+        names = tuple(description[0] for description in self.description or ())
+
+        if row_factory == "dict":
+            return lambda row: dict(zip(names, row))
+
+        if row_factory == "namedtuple":
+            return functools.partial(tuple.__new__, collections.namedtuple("Row", names, rename = True))
+
+        if row_factory == "slots":
+            fields = collections.namedtuple("Row", names, rename = True)._fields
+            row_type = type("Row", (), {"__slots__" : fields})
+            setters = tuple(getattr(row_type, field).__set__ for field in fields)
+
+            def create_row(row):
+                instance = row_type.__new__(row_type)
+
+                for setter, value in zip(setters, row):
+                    setter(instance, value)
+
+                return instance
+
+            return create_row
+
+        if isinstance(row_factory, type):
+            return lambda row: row_factory(*row)
+
+        return row_factory(self.description)
+
+    def convert_rows(self, rows):
+        if self.row_factory is None or self.lazy_rows:
+            return tuple(rows)
+
+        return tuple(map(self.row_converter(), rows))
+
+    def prepare(self, operation):
+        self.clear_messages()
+        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+        SQLFreeStmt(self.statement_handle, SQL_UNBIND)
+        SQLFreeStmt(self.statement_handle, SQL_RESET_PARAMS)
+        self.parameter_buffers = None
+        self.result_buffers = None
+        self.pending_rows = None
+        self.call_directions = ()
+        self.operation = str(operation)
+        self.defines_schema = self.connection.definition_pattern.match(self.operation) is not None
+        self.writes = self.connection.writes(self.operation)
+        self.prepared = True
+        self.reprepare = False
+        self.prepared_tags = ()
+
+        if self.connection.result_cache is not None:
+            query, tags = self.connection.result_cache.statement_tags(operation)
+
+            if not query:
+                self.prepared_tags = tags
+
+        sqlchar_operation = cast(create_string_buffer(str(operation).encode()), POINTER(SQLCHAR))
+        self.finish_query()
+        span = None if self.connection.tracer is None else self.start_span("sqlpydb.prepare")
+        started = time.perf_counter()
+        sr = SQLPrepare(self.statement_handle, sqlchar_operation, SQL_NTS)
+        self.prepare_time = time.perf_counter() - started
+
+        if span is not None:
+            self.end_span(span, sr)
+
+        self.expire_descriptions(sr)
+        self.check(sr, "UNABLE TO PREPARE STATEMENT")
+        self.bind_parameter_buffers_server_type()
+        return self
+
+    def execute_prepared(self, parameters = None):
+        self.clear_messages()
+
+        if self.connection.retryable(self.operation):
+            return self.connection.retry_policy.run(self.connection, self.execute_prepared_once, parameters, writes = self.writes)
+
+        return self.execute_prepared_once(parameters)
+
+    def execute_prepared_once(self, parameters = None):
+        if self.reprepare:
+            directions = self.call_directions
+            self.prepare(self.operation)
+
+            if directions:
+                self.call_directions = directions
+                self.bind_parameter_set(*self.create_parameter_set(1))
+
+        self.cached_rows = None
+        self.pending_rows = None
+        self.cache_key = None
+
+        if self.prepared_tags:
+            self.connection.result_cache.invalidate(*self.prepared_tags)
+
+        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+        self.set_paramset_size(1)
+        self.set_parameters(parameters)
+        span = None if self.connection.tracer is None else self.start_span("sqlpydb.execute")
+        started = time.perf_counter()
+        sr = SQLExecute(self.statement_handle)
+        self.begin_query(time.perf_counter() - started)
+
+        if span is not None:
+            self.end_span(span, sr)
+
+        self.expire_descriptions(sr)
+
+        if self.writes:
+            self.connection.transaction_writes = True
+
+        self.check(sr, "UNABLE TO EXECUTE STATEMENT")
+
+        if not self.result_set == 0:
+            self.result_set = 0
+            self.bind_result_set()
+
+        self.bind_result_buffers()
+        self.read_rowcount()
+        self.rows_fetched.value = 0
+        self.rowset_position = 0
+        self.rownumber = 0
+        return self.finish_statement()
+
+    def execute_language(self, operation, parameters = None):
+        self.cached_rows = None
+        self.pending_rows = None
+        self.cache_key = None
+        self.finish_query()
+        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
         SQLFreeStmt(self.statement_handle, SQL_UNBIND)
         SQLFreeStmt(self.statement_handle, SQL_RESET_PARAMS)
         self.parameter_buffers = None
         self.result_buffers = None
+        self.call_directions = ()
+        self.operation = str(operation)
+        self.defines_schema = self.connection.definition_pattern.match(self.operation) is not None
+        self.writes = self.connection.writes(self.operation)
+        self.prepared = False
         self.bind_parameter_buffers_client_type(parameters)
+        self.set_paramset_size(1)
         self.set_parameters(parameters)
-        sqlchar_operation = cast(create_string_buffer(str(operation).encode()), POINTER(SQLCHAR))
-        SQLExecDirect(self.statement_handle, sqlchar_operation, SQL_NTS)
+        sqlchar_operation = cast(create_string_buffer(self.operation.encode()), POINTER(SQLCHAR))
+        self.prepare_time = 0.0
+        span = None if self.connection.tracer is None else self.start_span("sqlpydb.execute")
+        started = time.perf_counter()
+        sr = SQLExecDirect(self.statement_handle, sqlchar_operation, SQL_NTS)
+        self.begin_query(time.perf_counter() - started)
+
+        if span is not None:
+            self.end_span(span, sr)
+
+        self.expire_descriptions(sr)
+
+        if self.writes:
+            self.connection.transaction_writes = True
+
+        self.check(sr, "UNABLE TO EXECUTE STATEMENT")
+        self.result_set = 0
+        self.bind_result_buffers()
+        return self.read_rowcount().finish_statement()
+
+    def expire_descriptions(self, sr):
+        if self.defines_schema:
+            self.connection.forget_descriptions()
+        elif sr == SQL_ERROR:
+            self.connection.forget_descriptions(self.operation)
+
+        return self
+
+    def execute_catalog(self, function, *arguments):
+        self.cached_rows = None
+        self.pending_rows = None
+        self.cache_key = None
+        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+        SQLFreeStmt(self.statement_handle, SQL_UNBIND)
+        self.result_buffers = None
+        self.operation = None
+        self.prepared = False
+        self.result_set = 0
+
+        self.check(function(self.statement_handle, *arguments), "UNABLE TO READ CATALOG")
+
         self.bind_result_buffers()
         return self
 
-    def execute(self, operation, parameters = None):
-        return self.execute_language(operation, parameters)
+    def execute(self, operation, parameters = None):
+        self.clear_messages()
+
+        if self.connection.retryable(str(operation)):
+            return self.connection.retry_policy.run(self.connection, self.execute_once, operation, parameters, writes = self.connection.writes(str(operation)))
+
+        return self.execute_once(operation, parameters)
+
+    def execute_once(self, operation, parameters = None):
+        if self.connection.result_cache is not None:
+            return self.execute_cached(operation, parameters)
+
+        return self.execute_language(operation, parameters)
+
+    def execute_cached(self, operation, parameters = None):
+        result_cache = self.connection.result_cache
+        query, tags = result_cache.statement_tags(operation)
+
+        if not query:
+            result_cache.invalidate(*tags)
+            return self.execute_language(operation, parameters)
+
+        key = result_cache.make_key(operation, parameters)
+        entry = result_cache.get_entry(key)
+
+        if entry is None:
+            self.execute_language(operation, parameters)
+            self.cache_key = key
+            self.cache_tags = tags
+            return self
+
+        rows, description = entry
+        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+        self.result_set = 0
+        self.converter = None
+        self.description = description
+        self.cached_rows = rows
+        self.cached_position = 0
+        self.cache_key = None
+        self.rownumber = 0
+        self.rowcount = len(rows)
+        return self
+
+    def parameter_batches(self, sequence_of_parameters, size):
+        iterator = iter(sequence_of_parameters)
+        batch = list(itertools.islice(iterator, size))
+
+        while batch:
+            yield batch
+            batch = list(itertools.islice(iterator, size))
+
+    def fill_parameter_set(self, buffers, batch):
+        for row, parameters in enumerate(batch):
+            for index in range(max(len(parameters), len(buffers))):
+                buffers[index][3].set_value(parameters[index], row)
+
+        return len(batch)
+
+    def execute_batch(self, batch, statuses = False):
+        self.bind_parameter_buffers_server_type(max(len(batch), self.parameter_rows))
+        return self.execute_parameter_sets(self.fill_parameter_set(self.parameter_buffers, batch), statuses)
+
+    def execute_parameter_sets(self, count, statuses = False):
+        self.cached_rows = None
+        self.pending_rows = None
+        self.cache_key = None
+
+        if self.prepared_tags:
+            self.connection.result_cache.invalidate(*self.prepared_tags)
+
+        SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+        self.set_paramset_size(count)
+        self.parameters_processed.value = 0
+        span = None if self.connection.tracer is None else self.start_span("sqlpydb.execute", {"db.operation.batch.size" : count})
+        started = time.perf_counter()
+        sr = SQLExecute(self.statement_handle)
+        elapsed = time.perf_counter() - started
+
+        if span is not None:
+            self.end_span(span, sr)
+
+        if self.query_record is None:
+            self.begin_query(elapsed)
+        else:
+            self.query_record.execute = self.query_record.execute + elapsed
+
+        self.expire_descriptions(sr)
+
+        if self.writes:
+            self.connection.transaction_writes = True
+
+        if not (statuses and sr == SQL_ERROR):
+            self.check(sr, "UNABLE TO EXECUTE PARAMETER ARRAY")
+
+        row_count = SQLLEN()
+        SQLRowCount(self.statement_handle, byref(row_count))
+
+        if row_count.value > 0:
+            self.rowcount = self.rowcount + row_count.value
+
+            if self.query_record is not None:
+                self.query_record.rows = self.query_record.rows + row_count.value
+
+        self.connection.count_rows(row_count.value)
+        return sr
+
+    def execute_pipelined(self, batches):
+        parameter_sets = (self.create_parameter_set(self.paramset_size), self.create_parameter_set(self.paramset_size))
+        pending = None
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            for index, batch in enumerate(batches):
+                buffers, status = parameter_sets[index % 2]
+                count = self.fill_parameter_set(buffers, batch)
+
+                if pending is not None:
+                    pending.result()
+
+                self.bind_parameter_set(buffers, status)
+                pending = executor.submit(contextvars.copy_context().run, self.execute_parameter_sets, count)
+
+            if pending is not None:
+                pending.result()
+
+        return self
+
+    def executemany(self, operation, sequence_of_parameters = None, pipelined = False):
+        self.clear_messages()
+        self.prepare(operation)
+        self.rowcount = 0
+        batches = self.parameter_batches(sequence_of_parameters, self.paramset_size)
+
+        if pipelined:
+            return self.execute_pipelined(batches).finish_query()
+
+        for batch in batches:
+            self.execute_batch(batch)
+
+        return self.finish_query()
+
+    def record_statuses(self, statuses, succeeded):
+        for offset, status in enumerate(statuses):
+            if not status in succeeded:
+                self.failed_rows.append(self.rows_processed + offset)
+
+        self.rows_processed = self.rows_processed + len(statuses)
+        return self
+
+    def supports_bulk_add(self, cursor_type = SQL_CURSOR_KEYSET_DRIVEN):
+        supported = SQLUSMALLINT()
+        sr = SQLGetFunctions(self.connection.connection_handle, SQL_API_SQLBULKOPERATIONS, byref(supported))
+
+        if (not sr == SQL_SUCCESS) or (not supported.value):
+            return False
+
+        attributes = SQLUINTEGER()
+        sr = SQLGetInfo(self.connection.connection_handle, self.cursor_attributes[cursor_type], byref(attributes), sizeof(attributes), None)
+
+        if not sr == SQL_SUCCESS:
+            return False
+
+        return (attributes.value & SQL_CA1_BULK_ADD) != 0
+
+    def bulk_add(self, table, columns, batches, batch_size):
+        previous_cursor_type = (self.cursor_type, self.concurrency)
+        previous_rowset_size = self.rowset_size
+        previous_fetch_budget = self.fetch_budget
+        previous_string_buffer_limit = self.string_buffer_limit
+
+        try:
+            self.fetch_budget = None
+            self.string_buffer_limit = None
+            self.apply_cursor_type(SQL_CURSOR_KEYSET_DRIVEN, SQL_CONCUR_LOCK)
+
+            if self.cursor_type == SQL_CURSOR_FORWARD_ONLY or self.concurrency == SQL_CONCUR_READ_ONLY:
+                return ()
+
+            self.rowset_size = batch_size
+            select = "SELECT " + ", ".join(columns) + " FROM " + table + " WHERE 1 = 0"
+            self.execute_language(select)
+
+            if not len(self.result_buffers) == len(columns):
+                return ()
+
+            result_cache = self.connection.result_cache
+            tags = () if result_cache is None else result_cache.statement_tags(self.insert_statement(table, columns))[1]
+
+            for batch in batches:
+                count = len(batch)
+
+                if self.rows_processed > 0 and not self.connection.transaction_writes:
+                    self.execute_language(select)
+
+                self.size_unbounded_columns(batch)
+
+                for row, values in enumerate(batch):
+                    for column, value in zip(self.result_buffers, values):
+                        column[3].set_value(value, row)
+
+                for row in range(count):
+                    self.row_status[row] = SQL_ROW_NOROW
+
+                SQLSetStmtAttr(self.statement_handle, SQL_ATTR_ROW_ARRAY_SIZE, count, SQL_IS_UINTEGER)
+                sr = SQLBulkOperations(self.statement_handle, SQL_ADD)
+                self.connection.transaction_writes = True
+
+                if tags:
+                    result_cache.invalidate(*tags)
+
+                statuses = self.row_status[:count]
+
+                if sr == SQL_ERROR and self.rows_processed == 0 and not SQL_ROW_ADDED in statuses:
+                    return (batch, )
+
+                failed = len(self.failed_rows)
+                self.record_statuses(statuses, (SQL_ROW_ADDED, SQL_ROW_SUCCESS, SQL_ROW_SUCCESS_WITH_INFO))
+                self.connection.count_rows(count - (len(self.failed_rows) - failed))
+
+            return None
+        finally:
+            SQLFreeStmt(self.statement_handle, SQL_CLOSE)
+            SQLFreeStmt(self.statement_handle, SQL_UNBIND)
+            self.result_buffers = None
+            self.rowset_size = previous_rowset_size
+            self.fetch_budget = previous_fetch_budget
+            self.string_buffer_limit = previous_string_buffer_limit
+            self.apply_cursor_type(*previous_cursor_type)
+
+    def size_unbounded_columns(self, batch):
+        for index, description in enumerate(self.description):
+            buffer = self.result_buffers[index][3]
+
+            if description[3] > 0 or not isinstance(buffer, string_buffer):
+                continue
+
+            longest = max([len(str(values[index]).encode()) for values in batch if values[index] is not None] or [0])
+
+            if longest >= buffer.buffer_size:
+                self.rebind_column(index, longest)
+
+        return self
+
+    def insert_statement(self, table, columns):
+        return "INSERT INTO " + table + " (" + ", ".join(columns) + ") VALUES (" + ", ".join("?" * len(columns)) + ")"
+
+    def parameter_successes(self, sr):
+        if sr == SQL_ERROR:
+            return (SQL_PARAM_SUCCESS, SQL_PARAM_SUCCESS_WITH_INFO)
+
+        return (SQL_PARAM_SUCCESS, SQL_PARAM_SUCCESS_WITH_INFO, SQL_PARAM_DIAG_UNAVAILABLE)
+
+    def record_parameter_statuses(self, sr, count):
+        return self.record_statuses(self.parameter_status[:count], self.parameter_successes(sr))
+
+    def insert_batches(self, table, columns, batches):
+        self.prepare(self.insert_statement(table, columns))
+
+        for batch in batches:
+            self.record_parameter_statuses(self.execute_batch(batch, True), len(batch))
+
+        return self
+
+    def bulk_insert(self, table, columns, rows, batch_size = None):
+        self.clear_messages()
+
+        if batch_size is None:
+            batch_size = self.paramset_size
+
+        columns = tuple(columns)
+        batches = self.parameter_batches(rows, batch_size)
+        self.rowcount = 0
+        self.rows_processed = 0
+        self.failed_rows = []
+        pending = ()
+
+        if self.supports_bulk_add():
+            pending = self.bulk_add(table, columns, batches, batch_size)
+
+        if pending is not None:
+            self.insert_batches(table, columns, itertools.chain(pending, batches))
+
+        self.rowcount = self.rows_processed - len(self.failed_rows)
+        return self
+
+    def import_csv(self, table_or_sql, path_or_file, columns = None, batch_rows = None, delimiter = ",", header = True, null = "", encoding = "utf-8"):
+        self.clear_messages()
+
+        if batch_rows is None:
+            batch_rows = self.paramset_size
+
+        if isinstance(path_or_file, str):
+            source = open(path_or_file, "r", newline = "", encoding = encoding)
+        else:
+            source = path_or_file
+
+        try:
+            reader = csv.reader(source, delimiter = delimiter)
+            names = next(reader, None) if header else None
+            indexes = None
+
+            if columns is None:
+                columns = names
+            elif names is not None:
+                missing = [column for column in columns if not column in names]
+
+                if missing:
+                    raise self.connection.ProgrammingError("COLUMNS NOT IN HEADER: " + ", ".join(missing))
+
+                indexes = [names.index(column) for column in columns]
+
+            if self.connection.statement_pattern.match(table_or_sql):
+                self.prepare(table_or_sql)
+            elif columns is None:
+                raise self.connection.ProgrammingError("COLUMN NAMES REQUIRED WITHOUT A HEADER")
+            else:
+                self.prepare(self.insert_statement(table_or_sql, columns))
+
+            self.rowcount = 0
+            self.rows_processed = 0
+            self.failed_rows = []
+            self.bind_parameter_buffers_server_type(batch_rows)
+            width = len(names) if names is not None else len(self.parameter_buffers)
+
+            for batch in self.parameter_batches((record for record in reader if record), batch_rows):
+                rows = [record for record in batch if len(record) == width]
+                sr = SQL_SUCCESS
+                statuses = iter(())
+
+                if rows:
+                    fields = list(zip(*rows))
+
+                    if indexes is not None:
+                        fields = [fields[index] for index in indexes]
+
+                    for (c_type, sql_type, digits, buffer), column in zip(self.parameter_buffers, fields):
+                        self.fill_parameter_column(buffer, self.field_converters.get(c_type), column, null, encoding)
+
+                    sr = self.execute_parameter_sets(len(rows), True)
+                    statuses = iter(self.parameter_status[:len(rows)])
+
+                self.record_statuses([next(statuses) if len(record) == width else SQL_PARAM_ERROR for record in batch],
+                                     self.parameter_successes(sr))
+        finally:
+            if isinstance(path_or_file, str):
+                source.close()
+
+        self.rowcount = self.rows_processed - len(self.failed_rows)
+        return self
+
+    def fill_parameter_column(self, buffer, converter, fields, null, encoding):
+        count = len(fields)
+
+        if converter is None:
+            size = buffer.buffer_size
+            cells = [field.encode(encoding) for field in fields]
+
+            if max(map(len, cells)) >= size:
+                raise self.connection.DataError("STRING DATA RIGHT TRUNCATION")
+
+            raw = b"".join([cell.ljust(size, b"\0") for cell in cells])
+            memmove(buffer.buffer, raw, len(raw))
+            buffer.length[0:count] = [SQL_NULL_DATA if field == null else len(cell) for field, cell in zip(fields, cells)]
+        elif null in fields:
+            try:
+                buffer.buffer[0:count] = [0 if field == null else converter(field) for field in fields]
+            except ValueError as error:
+                raise self.connection.DataError("INVALID NUMERIC FIELD: " + str(error))
+
+            buffer.length[0:count] = [SQL_NULL_DATA if field == null else buffer.buffer_size for field in fields]
+        else:
+            try:
+                buffer.buffer[0:count] = list(map(converter, fields))
+            except ValueError as error:
+                raise self.connection.DataError("INVALID NUMERIC FIELD: " + str(error))
+
+            buffer.length[0:count] = [buffer.buffer_size] * count
+
+        return self
+
+    def fetch_rowset(self, orientation = SQL_FETCH_NEXT, offset = 0):
+        if self.pending_growth:
+            self.grow_bindings()
+
+        span = None if self.connection.tracer is None else self.start_span("sqlpydb.fetch")
+        started = time.perf_counter()
+        sr = SQLFetchScroll(self.statement_handle, orientation, offset)
+        elapsed = time.perf_counter() - started
+
+        if span is not None:
+            self.end_span(span, sr, {"db.response.returned_rows" : self.rows_fetched.value if sr == SQL_SUCCESS or sr == SQL_SUCCESS_WITH_INFO else 0})
+
+        self.rowset_position = 0
+        self.lazy_block = None
+
+        if sr == SQL_NO_DATA:
+            self.rows_fetched.value = 0
+
+            if self.query_record is not None:
+                self.query_record.fetched(elapsed, 0, 0)
+                self.finish_query()
+
+            return False
+
+        if not sr == SQL_SUCCESS:
+            if not sr == SQL_SUCCESS_WITH_INFO:
+                self.rows_fetched.value = 0
+                self.finish_query()
+
+            if not self.check(sr, "UNABLE TO FETCH") == SQL_SUCCESS_WITH_INFO:
+                return False
+
+        if self.query_record is not None:
+            rows_fetched = self.rows_fetched.value
+            self.query_record.fetched(elapsed, rows_fetched, sum([buffer.get_data_size(rows_fetched) for c_type, sql_type, digits, buffer in self.result_buffers]))
+
+        if self.fetch_budget is not None:
+            self.adapt_fetch_size(elapsed)
+
+        if self.capped_columns:
+            self.complete_truncated()
+
+        return True
+
+    def next_rowset_block(self):
+        if self.rowset_position >= self.rows_fetched.value:
+            if not self.fetch_rowset():
+                return (0, 0)
+
+        start = self.rowset_position
+        count = self.rows_fetched.value - start
+        self.rowset_position = self.rows_fetched.value
+        self.rownumber = self.rownumber + count
+        return (start, count)
+
+    def block_layout(self):
+        columns = ()
+        offset = 0
+
+        for c_type, sql_type, digits, buffer in self.result_buffers:
+            value_format = "s" if isinstance(buffer, string_buffer) else buffer.buffer._type_._type_
+            length_offset = offset + sizeof(buffer.buffer)
+            columns = columns + ((value_format, buffer.get_size(), offset, length_offset, ), )
+            offset = length_offset + sizeof(buffer.length)
+
+        return (columns, offset, self.rowset_capacity)
+
+    def block_overflows(self):
+        overflows = tuple(getattr(column[3], "overflow", None) for column in self.result_buffers)
+        return overflows if any(overflows) else None
+
+    def block_length_format(self):
+        return SQLLEN._type_
+
+    def copy_rowset(self, address):
+        for c_type, sql_type, digits, buffer in self.result_buffers:
+            memmove(address, buffer.buffer, sizeof(buffer.buffer))
+            address = address + sizeof(buffer.buffer)
+            memmove(address, buffer.length, sizeof(buffer.length))
+            address = address + sizeof(buffer.length)
+
+        return self
+
+    def export_csv(self, path_or_file, delimiter = ",", header = True, null = "", compress = None, compresslevel = 6):
+        self.clear_messages()
 
-    def executemany(self, operation, sequence_of_parameters = None):
-        self.prepare(operation)
+        if compress is None:
+            compress = isinstance(path_or_file, str) and path_or_file.endswith(".gz")
+
+        if isinstance(path_or_file, str):
+            output = open(path_or_file, "wb")
+        else:
+            output = path_or_file
 
-        for parameters in sequence_of_parameters:
-            self.execute_prepared(parameters)
+        writer = gzip.GzipFile(fileobj = output, mode = "wb", compresslevel = compresslevel) if compress else output
+        delimiter = delimiter.encode()
+        null = null.encode()
+        special = re.compile(b"[" + re.escape(delimiter + b"\"\r\n") + b"]")
+        rows = 0
 
-        return self
+        try:
+            if header:
+                names = [str(name).encode() for name in self.column_names()]
+                writer.write(delimiter.join(self.escape_cells(names, special)) + b"\n")
+
+            if self.cached_rows is not None or self.pending_rows:
+                for block in iter(lambda: self.fetch_rows(self.rowset_size or 1), []):
+                    columns = [self.escape_cells([null if value is None else str(value).encode() for value in column], special) for column in zip(*block)]
+                    writer.write(b"\n".join(map(delimiter.join, zip(*columns))) + b"\n")
+                    rows = rows + len(block)
+            elif self.result_buffers:
+                start, count = self.next_rowset_block()
+
+                while count > 0:
+                    columns = [self.escape_cells(self.format_column(column[3], start, count, null), special) for column in self.result_buffers]
+                    writer.write(b"\n".join(map(delimiter.join, zip(*columns))) + b"\n")
+                    rows = rows + count
+                    start, count = self.next_rowset_block()
+        finally:
+            if compress:
+                writer.close()
+
+            if isinstance(path_or_file, str):
+                output.close()
+
+        return rows
+
+    def fetchall_spilled(self, directory = None):
+        if self.cached_rows is not None:
+            raise self.connection.NotSupportedError("SPILL OF CACHED RESULT")
+
+        if self.pending_rows:
+            raise self.connection.NotSupportedError("SPILL OF PARTIALLY ITERATED RESULT")
+
+        if self.result_buffers:
+            self.bind_blocks()
+
+        return SpilledResult(self, directory)
+
+    def copy_lazy_block(self):
+        if self.lazy_block is None:
+            self.lazy_block = (tuple(column[3].copy() for column in self.result_buffers), self.row_index(), )
+
+        return self.lazy_block
+
+    def row_index(self):
+        if self.column_index is None:
+            self.column_index = {}
+
+            for index, name in enumerate(self.column_names()):
+                self.column_index.setdefault(name, index)
+
+        return self.column_index
+
+    def column_names(self):
+        descriptions = self.description or self.describe_columns()
+        return [description[0] for description in descriptions]
+
+    def fetch_arrow_batches(self):
+        if self.cached_rows is not None:
+            raise self.connection.NotSupportedError("ARROW EXPORT OF CACHED RESULT")
+
+        if self.pending_rows:
+            raise self.connection.NotSupportedError("ARROW EXPORT OF PARTIALLY ITERATED RESULT")
+
+        if not self.result_buffers:
+            return
+
+        self.bind_blocks()
+        names = self.column_names()
+        start, count = self.next_rowset_block()
+
+        while count > 0:
+            yield arrow.ArrowBatch(names, [self.arrow_column(column, start, count) for column in self.result_buffers], count)
+            start, count = self.next_rowset_block()
+
+    def arrow_column(self, column, start, count):
+        c_type, sql_type, digits, buffer = column
+        flags = [not length == SQL_NULL_DATA for length in buffer.length[start:start + count]]
+        null_count = count - sum(flags)
+        validity = arrow.pack_bits(flags) if null_count else None
+
+        if isinstance(buffer, string_buffer):
+            cells = self.format_column(buffer, start, count, b"")
+            offsets = (c_int32 * (count + 1))(*itertools.accumulate(map(len, cells), initial = 0))
+            data = b"".join(cells)
+            return ("u", validity, null_count, (offsets, create_string_buffer(data, max(1, len(data))), ))
+
+        if c_type == SQL_C_BIT:
+            return ("b", validity, null_count, (arrow.pack_bits(buffer.buffer[start:start + count]), ))
+
+        size = buffer.get_size()
+        data = create_string_buffer(count * size)
+        memmove(data, addressof(buffer.buffer) + start * size, count * size)
+        return (arrow.fixed_format(buffer.buffer._type_), validity, null_count, (data, ))
+
+    def format_column(self, buffer, start, count, null):
+        lengths = buffer.length[start:start + count]
+
+        if isinstance(buffer, string_buffer):
+            size = buffer.buffer_size
+            raw = buffer.buffer.raw
+            cells = []
+
+            for offset, length in zip(range(start * size, (start + count) * size, size), lengths):
+                if 0 <= length < size:
+                    cells.append(raw[offset:offset + length])
+                elif length == SQL_NULL_DATA:
+                    cells.append(null)
+                elif buffer.overflow and offset // size in buffer.overflow:
+                    cells.append(buffer.overflow[offset // size].encode())
+                else:
+                    cells.append(raw[offset:offset + size].partition(b"\0")[0])
+
+            return cells
+
+        values = buffer.buffer[start:start + count]
+
+        if SQL_NULL_DATA in lengths:
+            text = "\n".join(["" if length == SQL_NULL_DATA else str(value) for value, length in zip(values, lengths)])
+            return [cell or null for cell in text.encode().split(b"\n")]
+
+        return "\n".join(map(str, values)).encode().split(b"\n")
+
+    def escape_cells(self, cells, special):
+        if not special.search(b"".join(cells)):
+            return cells
+
+        return [b"\"" + cell.replace(b"\"", b"\"\"") + b"\"" if special.search(cell) else cell for cell in cells]
 
     def fetchone(self):
-        sr = SQLFetch(self.statement_handle)
+        row = self.fetch_row()
 
-        if sr == SQL_NO_DATA:
-            return None
+        if row is None or self.row_factory is None or self.lazy_rows:
+            return row
+
+        return self.row_converter()(row)
+
+    def fetch_row(self):
+        if self.cached_rows is not None:
+            return self.fetchone_cached()
+
+        if self.pending_rows:
+            self.rownumber = self.rownumber + 1
+            return self.pending_rows.popleft()
+
+        if self.rowset_position >= self.rows_fetched.value:
+            if not self.fetch_rowset():
+                return None
+
+        row = self.rowset_row(self.rowset_position)
+        self.rowset_position = self.rowset_position + 1
+        self.rownumber = self.rownumber + 1
+        return row
+
+    def rowset_row(self, position):
+        if self.lazy_rows:
+            return LazyRow(self.copy_lazy_block(), position)
 
         row = ()
 
         for column in self.result_buffers:
-            row = row + (column[3].get_value(), )
+            row = row + (column[3].get_value(position), )
 
         return row
 
@@ -420,32 +2248,85 @@ class Cursor:
         if size is None:
             size = self.arraysize
 
-        row_set = ()
+        return self.convert_rows(self.fetch_rows(size))
+
+    def fetch_rows(self, size):
+        rows = []
 
         while size > 0:
-            row = self.fetchone()
+            row = self.fetch_row()
 
             if row is None:
                 break
 
-            row_set = row_set + (row, )
+            rows.append(row)
+            size = size - 1
+
+        return rows
+
+    def fetchone_cached(self):
+        if self.cached_position >= len(self.cached_rows):
+            return None
 
-        return row_set
+        row = self.cached_rows[self.cached_position]
+        self.cached_position = self.cached_position + 1
+        self.rownumber = self.cached_position
+        return row
 
     def fetchall(self):
-        row_set = ()
+        if self.cached_rows is not None:
+            row_set = self.cached_rows[self.cached_position:]
+            self.cached_position = len(self.cached_rows)
+            self.rownumber = self.cached_position
+            return self.convert_rows(row_set)
 
-        row = self.fetchone()
+        cache_key = self.cache_key if self.rownumber == 0 and not self.lazy_rows else None
+        self.cache_key = None
+        rows = []
+
+        row = self.fetch_row()
 
         while row is not None:
-            row_set = row_set + (row, )
-            row = self.fetchone()
+            rows.append(row)
+            row = self.fetch_row()
 
-        return row_set
+        row_set = tuple(rows)
+
+        if cache_key is not None:
+            self.connection.result_cache.put(cache_key, row_set, self.cache_tags, description = self.description)
+
+        return self.convert_rows(row_set)
 
     def nextset(self):
-        SQLMoreResults(self.statement_handle)
-        return self
+        self.clear_messages()
+
+        if self.cached_rows is not None:
+            return None
+
+        self.pending_rows = None
+        sr = self.check(SQLMoreResults(self.statement_handle), "UNABLE TO READ NEXT RESULT SET")
+
+        if (not sr == SQL_SUCCESS) and (not sr == SQL_SUCCESS_WITH_INFO):
+            self.rows_fetched.value = 0
+            self.rowset_position = 0
+            return None
+
+        self.result_set = self.result_set + 1
+        self.bind_result_set()
+        return self.read_rowcount()
+
+    def iter_result_sets(self):
+        while True:
+            rows = iter(self) if self.description is not None else iter(())
+
+            try:
+                yield (self.description, self.rowcount, rows, )
+            finally:
+                if hasattr(rows, "close"):
+                    rows.close()
+
+            if self.nextset() is None:
+                break
 
     def setinputsizes(self, sizes):
         return self
@@ -453,16 +2334,47 @@ class Cursor:
     def setoutputsize(self, size, column = None):
         return self
 
+    def scroll_forward(self, value):
+        if value < 0:
+            raise self.connection.NotSupportedError("FORWARD ONLY CURSOR")
+
+        while value > 0:
+            if self.fetch_row() is None:
+                raise IndexError("SCROLL OUT OF RANGE")
+
+            value = value - 1
+
+        return self
+
     def scroll_absolute(self, value):
-        SQLFetchScroll(self.statement_handle, SQL_FETCH_ABSOLUTE, value)
+        if value < 0:
+            raise IndexError("SCROLL OUT OF RANGE")
+
+        if self.cached_rows is not None:
+            if value >= len(self.cached_rows):
+                raise IndexError("SCROLL OUT OF RANGE")
+
+            self.cached_position = value
+            self.rownumber = value
+            return self
+
+        if self.cursor_type == SQL_CURSOR_FORWARD_ONLY:
+            return self.scroll_forward(value - self.rownumber)
+
+        if not self.fetch_rowset(SQL_FETCH_ABSOLUTE, value + 1):
+            raise IndexError("SCROLL OUT OF RANGE")
+
+        self.rownumber = value
         return self
 
     def scroll_relative(self, value):
-        SQLFetchScroll(self.statement_handle, SQL_FETCH_RELATIVE, value)
-        return self
+        if self.cursor_type == SQL_CURSOR_FORWARD_ONLY and self.cached_rows is None:
+            return self.scroll_forward(value)
+
+        return self.scroll_absolute(self.rownumber + value)
 
     def scroll(self, value, mode = "relative"):
-        return scroll_modes[mode](value)
+        return self.scroll_modes[mode](value)
 
     def next(self):
         row = self.fetchone()
@@ -472,6 +2384,249 @@ class Cursor:
 
         return row
 
+class Catalog:
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = None
+        self.rowset_size = 256
+        self.cache = {}
+        self.escape = None
+        self.pattern_flags = re.DOTALL
+
+    def name(self, value):
+        if value is None:
+            return (None, 0)
+
+        return (cast(create_string_buffer(str(value).encode()), POINTER(SQLCHAR)), SQL_NTS)
+
+    def lookup(self, key, refresh, function, *arguments):
+        if not refresh and key in self.cache:
+            return self.cache[key]
+
+        if self.cursor is None:
+            self.cursor = self.connection.cursor()
+            self.cursor.rowset_size = self.rowset_size
+
+        rows = self.cursor.execute_catalog(function, *arguments).fetchall()
+        self.cache[key] = rows
+        return rows
+
+    def lookup_table(self, key, table, refresh):
+        if refresh or table is None:
+            return None
+
+        rows = self.cache.get(key)
+
+        if rows is None:
+            return None
+
+        pattern = self.search_pattern(str(table))
+        return tuple(row for row in rows if pattern.match(row[2]))
+
+    def search_pattern(self, table):
+        if self.escape is None:
+            self.escape = self.connection.get_info_text(SQL_SEARCH_PATTERN_ESCAPE) or "\\"
+
+            if self.connection.get_info_integer(SQL_IDENTIFIER_CASE) in (SQL_IC_UPPER, SQL_IC_LOWER, SQL_IC_MIXED):
+                self.pattern_flags = re.DOTALL | re.IGNORECASE
+
+        expression = ""
+        escaped = False
+
+        for character in table:
+            if escaped:
+                expression = expression + re.escape(character)
+                escaped = False
+            elif character == self.escape:
+                escaped = True
+            elif character == "%":
+                expression = expression + ".*"
+            elif character == "_":
+                expression = expression + "."
+            else:
+                expression = expression + re.escape(character)
+
+        return re.compile(expression + "$", self.pattern_flags)
+
+    def covers(self, key, table):
+        if not key[0] in ("tables", "columns"):
+            return False
+
+        return key[3] is None or self.search_pattern(str(key[3])).match(str(table)) is not None
+
+    def tables(self, table = None, schema = None, catalog = None, table_type = None, refresh = False):
+        rows = self.lookup_table(("tables", catalog, schema, None, table_type), table, refresh)
+
+        if rows is not None:
+            return rows
+
+        return self.lookup(("tables", catalog, schema, table, table_type), refresh, SQLTables,
+                           *(self.name(catalog) + self.name(schema) + self.name(table) + self.name(table_type)))
+
+    def columns(self, table = None, schema = None, catalog = None, column = None, refresh = False):
+        if column is None:
+            rows = self.lookup_table(("columns", catalog, schema, None, None), table, refresh)
+
+            if rows is not None:
+                return rows
+
+        return self.lookup(("columns", catalog, schema, table, column), refresh, SQLColumns,
+                           *(self.name(catalog) + self.name(schema) + self.name(table) + self.name(column)))
+
+    def primary_keys(self, table, schema = None, catalog = None, refresh = False):
+        return self.lookup(("primary_keys", catalog, schema, table), refresh, SQLPrimaryKeys,
+                           *(self.name(catalog) + self.name(schema) + self.name(table)))
+
+    def indexes(self, table, schema = None, catalog = None, unique = False, refresh = False):
+        if unique:
+            index_type = SQL_INDEX_UNIQUE
+        else:
+            index_type = SQL_INDEX_ALL
+
+        return self.lookup(("indexes", catalog, schema, table, unique), refresh, SQLStatistics,
+                           *(self.name(catalog) + self.name(schema) + self.name(table) + (index_type, SQL_QUICK)))
+
+    def foreign_keys(self, table = None, schema = None, catalog = None,
+                     foreign_table = None, foreign_schema = None, foreign_catalog = None, refresh = False):
+        return self.lookup(("foreign_keys", catalog, schema, table, foreign_catalog, foreign_schema, foreign_table),
+                           refresh, SQLForeignKeys,
+                           *(self.name(catalog) + self.name(schema) + self.name(table) +
+                             self.name(foreign_catalog) + self.name(foreign_schema) + self.name(foreign_table)))
+
+    def refresh(self, table = None):
+        if table is None:
+            self.cache.clear()
+        else:
+            for key in tuple(self.cache):
+                if table in key or self.covers(key, table):
+                    del self.cache[key]
+
+        return self
+
+    def close(self):
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
+
+        return self
+
+class SpilledResult:
+    def __init__(self, cursor, directory = None):
+        self.file = tempfile.TemporaryFile(dir = directory)
+        self.blocks = []
+        self.block_starts = []
+        self.length_format = SQLLEN._type_
+        self.rows = 0
+        self.map = None
+        self.decoded = (None, None)
+
+        if cursor.result_buffers:
+            self.names = tuple(cursor.column_names())
+            start, count = cursor.next_rowset_block()
+
+            while count > 0:
+                self.spill_block(cursor, start, count)
+                start, count = cursor.next_rowset_block()
+        else:
+            self.names = ()
+
+        self.file.flush()
+
+        if self.file.tell() > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+    def spill_block(self, cursor, start, count):
+        columns = ()
+
+        for c_type, sql_type, digits, buffer in cursor.result_buffers:
+            length_size = sizeof(SQLLEN)
+            length_offset = self.file.tell()
+            self.file.write(string_at(addressof(buffer.length) + start * length_size, count * length_size))
+
+            if isinstance(buffer, string_buffer):
+                cells = cursor.format_column(buffer, start, count, b"")
+                offsets = (c_int64 * (count + 1))(*itertools.accumulate(map(len, cells), initial = 0))
+                offsets_offset = self.file.tell()
+                self.file.write(offsets)
+                data_offset = self.file.tell()
+                self.file.write(b"".join(cells))
+                columns = columns + (("s", length_offset, offsets_offset, data_offset, offsets[count], ), )
+            else:
+                size = buffer.get_size()
+                data_offset = self.file.tell()
+                self.file.write(string_at(addressof(buffer.buffer) + start * size, count * size))
+                columns = columns + ((buffer.buffer._type_._type_, length_offset, None, data_offset, count * size, ), )
+
+        self.block_starts.append(self.rows)
+        self.blocks.append((count, columns))
+        self.rows = self.rows + count
+        return self
+
+    def decode_block(self, index):
+        if self.decoded[0] == index:
+            return self.decoded[1]
+
+        count, columns = self.blocks[index]
+        view = memoryview(self.map)
+        length_size = struct.calcsize(self.length_format)
+        decoded = []
+
+        for value_format, length_offset, offsets_offset, data_offset, data_size in columns:
+            lengths = view[length_offset:length_offset + count * length_size].cast(self.length_format).tolist()
+
+            if value_format == "s":
+                offsets = view[offsets_offset:offsets_offset + (count + 1) * 8].cast("q").tolist()
+                data = self.map[data_offset:data_offset + data_size]
+                values = [data[offsets[row]:offsets[row + 1]].decode() for row in range(count)]
+            else:
+                values = view[data_offset:data_offset + data_size].cast(value_format).tolist()
+
+            if SQL_NULL_DATA in lengths:
+                values = [None if length == SQL_NULL_DATA else value for value, length in zip(values, lengths)]
+
+            decoded.append(values)
+
+        view.release()
+        rows = list(zip(*decoded))
+        self.decoded = (index, rows)
+        return rows
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.rows))]
+
+        if index < 0:
+            index = index + self.rows
+
+        if index < 0 or index >= self.rows:
+            raise IndexError("SPILLED RESULT INDEX OUT OF RANGE")
+
+        block = bisect.bisect_right(self.block_starts, index) - 1
+        return self.decode_block(block)[index - self.block_starts[block]]
+
+    def __iter__(self):
+        for index in range(len(self.blocks)):
+            yield from self.decode_block(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def close(self):
+        self.decoded = (None, None)
+
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+        self.file.close()
+        return self
+
 def Date(year, month, day):
     value = SQL_DATE_STRUCT()
     value.year = year
@@ -524,65 +2679,397 @@ ROWID = None
 
 def create_fixed_type_buffer_type(fixed_type):
     class fixed_type_buffer_type:
-        def __init__(self, size):
-            self.buffer_size = sizeof(fixed_type)
-            self.buffer = fixed_type()
-            self.length = SQLLEN()
+        def __init__(self, size, rows = 1):
+            self.buffer_size = self.element_size(size)
+            self.buffer = (fixed_type * rows)()
+            self.length = (SQLLEN * rows)()
 
-        def set_value(self, value):
+        def set_value(self, value, row = 0):
             if value is None:
-                self.length.value = SQL_NULL_DATA
+                self.length[row] = SQL_NULL_DATA
             else:
-                self.length.value = self.buffer_size
-                self.buffer.value = value
+                self.length[row] = self.buffer_size
+                self.buffer[row] = value
 
-        def get_value(self):
-            if self.length.value == SQL_NULL_DATA:
+        def get_value(self, row = 0):
+            if self.length[row] == SQL_NULL_DATA:
                 return None
             else:
-                return self.buffer.value
+                return self.buffer[row]
+
+        @staticmethod
+        def element_size(size):
+            return sizeof(fixed_type)
 
         def get_size(self):
             return self.buffer_size
 
+        def get_data_size(self, rows):
+            return self.buffer_size * sum(1 for length in self.length[0:rows] if not length == SQL_NULL_DATA)
+
         def get_reference(self):
             return byref(self.buffer)
 
         def get_length_reference(self):
-            return byref(self.length)
+            return self.length
+
+        def copy(self):
+            buffer = fixed_type_buffer_type.__new__(fixed_type_buffer_type)
+            buffer.buffer_size = self.buffer_size
+            buffer.buffer = type(self.buffer).from_buffer_copy(self.buffer)
+            buffer.length = type(self.length).from_buffer_copy(self.length)
+            return buffer
 
     return fixed_type_buffer_type
 
 class string_buffer:
-    def __init__(self, size):
-        if size > 64:
-            self.buffer_size = size
-        else:
-            self.buffer_size = 64
-
-        self.buffer = create_string_buffer(size)
-        self.length = SQLLEN()
+    def __init__(self, size, rows = 1):
+        self.buffer_size = self.element_size(size)
+        self.overflow = None
+        self.buffer = create_string_buffer(self.buffer_size * rows)
+        self.length = (SQLLEN * rows)()
 
-    def set_value(self, value):
+    def set_value(self, value, row = 0):
         if value is None:
-            self.length.value = SQL_NULL_DATA
+            self.length[row] = SQL_NULL_DATA
         else:
             encoded_value = str(value).encode()
-            self.length.value = len(encoded_value)
-            self.buffer.value = encoded_value
+            length = len(encoded_value)
+
+            if length >= self.buffer_size:
+                raise DataError("STRING DATA RIGHT TRUNCATION")
+
+            start = row * self.buffer_size
+            self.length[row] = length
+            self.buffer[start:start + length + 1] = encoded_value + b"\0"
 
-    def get_value(self):
-        if self.length.value == SQL_NULL_DATA:
+    def get_value(self, row = 0):
+        length = self.length[row]
+
+        if length == SQL_NULL_DATA:
             return None
+
+        start = row * self.buffer_size
+
+        if 0 <= length < self.buffer_size:
+            return self.buffer[start:start + length].decode()
+        elif self.overflow and row in self.overflow:
+            return self.overflow[row]
+        else:
+            return self.buffer[start:start + self.buffer_size].partition(b"\0")[0].decode()
+
+    @staticmethod
+    def element_size(size):
+        if size >= 64:
+            return size + 1
         else:
-            return self.buffer.value.decode()
+            return 64
 
     def get_size(self):
         return self.buffer_size
 
+    def get_data_size(self, rows):
+        return sum(self.buffer_size - 1 if length == SQL_NO_TOTAL else max(length, 0) for length in self.length[0:rows])
+
     def get_reference(self):
         return byref(self.buffer)
 
     def get_length_reference(self):
-        return byref(self.length)
+        return self.length
+
+    def copy(self):
+        buffer = string_buffer.__new__(string_buffer)
+        buffer.buffer_size = self.buffer_size
+        buffer.overflow = self.overflow
+        buffer.buffer = type(self.buffer).from_buffer_copy(self.buffer)
+        buffer.length = type(self.length).from_buffer_copy(self.length)
+        return buffer
+
+class LazyRow:
+    __slots__ = ("block", "position", "values")
+
+    missing = object()
+
+    def __init__(self, block, position):
+        self.block = block
+        self.position = position
+        self.values = [LazyRow.missing] * len(block[0])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self[index] for index in range(*key.indices(len(self.values))))
+
+        if isinstance(key, str):
+            key = self.block[1][key]
+        elif key < 0:
+            key = key + len(self.values)
+
+        value = self.values[key]
+
+        if value is LazyRow.missing:
+            value = self.block[0][key].get_value(self.position)
+            self.values[key] = value
+
+        return value
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        for index in range(len(self.values)):
+            yield self[index]
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+    def keys(self):
+        return list(self.block[1])
+
+class ResultCache:
+    query_pattern = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+    table_pattern = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+([\w\.\[\]\"`]+)", re.IGNORECASE)
+
+    def __init__(self, max_bytes = 64 * 1024 * 1024, ttl = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = collections.OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def statement_tags(self, operation):
+        operation = str(operation)
+        tags = ()
+
+        for table in self.table_pattern.findall(operation):
+            tag = table.split(".")[-1].strip("[]\"`").lower()
+
+            if tag not in tags:
+                tags = tags + (tag, )
+
+        return (self.query_pattern.match(operation) is not None, tags)
+
+    def make_key(self, operation, parameters = None):
+        if parameters is not None:
+            parameters = tuple(parameters)
+
+        key = (str(operation), parameters)
+
+        try:
+            hash(key)
+        except TypeError:
+            return None
 
+        return key
+
+    def get(self, key):
+        entry = self.get_entry(key)
+
+        if entry is None:
+            return None
+
+        return entry[0]
+
+    def get_entry(self, key):
+        if key is None:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses = self.misses + 1
+                return None
+
+            if entry[0] < time.monotonic():
+                self.discard(key)
+                self.misses = self.misses + 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits = self.hits + 1
+            data = entry[2]
+
+        return marshal.loads(data)
+
+    def put(self, key, rows, tags = (), ttl = None, description = None):
+        if key is None:
+            return self
+
+        try:
+            data = marshal.dumps((rows, description, ))
+        except ValueError:
+            return self
+
+        if len(data) > self.max_bytes:
+            return self
+
+        if ttl is None:
+            ttl = self.ttl
+
+        with self.lock:
+            if key in self.entries:
+                self.discard(key)
+
+            self.entries[key] = (time.monotonic() + ttl, tags, data)
+            self.size = self.size + len(data)
+
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+                self.evictions = self.evictions + 1
+
+        return self
+
+    def discard(self, key):
+        entry = self.entries.pop(key)
+        self.size = self.size - len(entry[2])
+
+        for tag in entry[1]:
+            keys = self.tags.get(tag)
+
+            if keys is not None:
+                keys.discard(key)
+
+                if not keys:
+                    del self.tags[tag]
+
+    def invalidate(self, *tags):
+        with self.lock:
+            for tag in tags:
+                for key in tuple(self.tags.get(str(tag).lower(), ())):
+                    self.discard(key)
+
+        return self
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.size = 0
+
+        return self
+
+class QueryRecord:
+    __slots__ = ("operation", "prepare", "execute", "first_row", "fetch", "rows", "bytes")
+
+    def __init__(self, operation, prepare, execute):
+        self.operation = operation
+        self.prepare = prepare
+        self.execute = execute
+        self.first_row = None
+        self.fetch = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def fetched(self, elapsed, rows, data_bytes):
+        if self.first_row is None:
+            self.first_row = elapsed
+
+        self.fetch = self.fetch + elapsed
+        self.rows = self.rows + rows
+        self.bytes = self.bytes + data_bytes
+        return self
+
+class QueryLog:
+    fingerprint_patterns = ((re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL), " "),
+                            (re.compile(r"'(?:[^']|'')*'"), "?"),
+                            (re.compile(r"\b0x[0-9a-f]+\b", re.IGNORECASE), "?"),
+                            (re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.IGNORECASE), "?"),
+                            (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?+)"),
+                            (re.compile(r"\s+"), " "))
+
+    def __init__(self, threshold = 1.0, path = None, callback = None, max_bytes = 10 * 1024 * 1024, backup_count = 5):
+        self.threshold = threshold
+        self.callback = callback
+        self.handler = None
+        self.fingerprint_cache_size = 4096
+        self.fingerprints = {}
+        self.statistics = {}
+        self.lock = threading.Lock()
+
+        if path is not None:
+            self.handler = logging.handlers.RotatingFileHandler(path, maxBytes = max_bytes, backupCount = backup_count)
+
+    @staticmethod
+    def normalize(operation):
+        for pattern, replacement in QueryLog.fingerprint_patterns:
+            operation = pattern.sub(replacement, operation)
+
+        return operation.strip().lower()
+
+    def fingerprint(self, operation):
+        fingerprint = self.fingerprints.get(operation)
+
+        if fingerprint is not None:
+            return fingerprint
+
+        fingerprint = self.normalize(operation)
+        fingerprint = (hashlib.sha1(fingerprint.encode()).hexdigest()[:16], fingerprint, )
+
+        if len(self.fingerprints) >= self.fingerprint_cache_size:
+            del self.fingerprints[next(iter(self.fingerprints))]
+
+        self.fingerprints[operation] = fingerprint
+        return fingerprint
+
+    def record(self, record):
+        total = record.prepare + record.execute + record.fetch
+
+        with self.lock:
+            identifier, fingerprint = self.fingerprint(record.operation)
+            statistics = self.statistics.get(identifier)
+
+            if statistics is None:
+                statistics = {"fingerprint" : fingerprint, "count" : 0, "slow" : 0, "total" : 0.0, "maximum" : 0.0, "rows" : 0, "bytes" : 0}
+                self.statistics[identifier] = statistics
+
+            statistics["count"] += 1
+            statistics["total"] += total
+            statistics["maximum"] = max(statistics["maximum"], total)
+            statistics["rows"] += record.rows
+            statistics["bytes"] += record.bytes
+
+            if total < self.threshold:
+                return self
+
+            statistics["slow"] += 1
+
+        entry = {"time" : time.time(),
+                 "id" : identifier,
+                 "fingerprint" : fingerprint,
+                 "prepare" : record.prepare,
+                 "execute" : record.execute,
+                 "first_row" : record.first_row,
+                 "fetch" : record.fetch,
+                 "total" : total,
+                 "rows" : record.rows,
+                 "bytes" : record.bytes}
+
+        if self.handler is not None:
+            self.handler.handle(logging.makeLogRecord({"msg" : json.dumps(entry)}))
+
+        if self.callback is not None:
+            self.callback(entry)
+
+        return self
+
+    def summary(self):
+        with self.lock:
+            return sorted([dict(statistics, id = identifier) for identifier, statistics in self.statistics.items()],
+                          key = lambda statistics: statistics["total"], reverse = True)
+
+    def close(self):
+        if self.handler is not None:
+            self.handler.close()
+
+        return self
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import itertools
+import threading
+
+from ctypes import *
+
+class ArrowSchema(Structure):
+    pass
+
+class ArrowArray(Structure):
+    pass
+
+release_schema_function = CFUNCTYPE(None, POINTER(ArrowSchema))
+release_array_function = CFUNCTYPE(None, POINTER(ArrowArray))
+
+ArrowSchema._fields_ = [("format", c_char_p),
+                        ("name", c_char_p),
+                        ("metadata", c_char_p),
+                        ("flags", c_int64),
+                        ("n_children", c_int64),
+                        ("children", POINTER(POINTER(ArrowSchema))),
+                        ("dictionary", POINTER(ArrowSchema)),
+                        ("release", release_schema_function),
+                        ("private_data", c_void_p)]
+
+ArrowArray._fields_ = [("length", c_int64),
+                       ("null_count", c_int64),
+                       ("offset", c_int64),
+                       ("n_buffers", c_int64),
+                       ("n_children", c_int64),
+                       ("buffers", POINTER(c_void_p)),
+                       ("children", POINTER(POINTER(ArrowArray))),
+                       ("dictionary", POINTER(ArrowArray)),
+                       ("release", release_array_function),
+                       ("private_data", c_void_p)]
+
+ARROW_FLAG_NULLABLE = 2
+
+exports = {}
+exports_lock = threading.Lock()
+export_tokens = itertools.count(1)
+
+def keep(objects):
+    token = next(export_tokens)
+
+    with exports_lock:
+        exports[token] = objects
+
+    return token
+
+def forget(token):
+    with exports_lock:
+        exports.pop(token, None)
+
+def release_schema(schema):
+    token = schema.contents.private_data
+
+    for index in range(schema.contents.n_children):
+        child = schema.contents.children[index]
+
+        if child.contents.release:
+            child.contents.release(child)
+
+    schema.contents.release = release_schema_function()
+    forget(token)
+
+def release_array(array):
+    token = array.contents.private_data
+
+    for index in range(array.contents.n_children):
+        child = array.contents.children[index]
+
+        if child.contents.release:
+            child.contents.release(child)
+
+    array.contents.release = release_array_function()
+    forget(token)
+
+release_schema_callback = release_schema_function(release_schema)
+release_array_callback = release_array_function(release_array)
+
+capsule_destructor_function = CFUNCTYPE(None, c_void_p)
+
+capsule_new = PYFUNCTYPE(py_object, c_void_p, c_char_p, capsule_destructor_function)(("PyCapsule_New", pythonapi))
+capsule_get_pointer = PYFUNCTYPE(c_void_p, c_void_p, c_char_p)(("PyCapsule_GetPointer", pythonapi))
+
+schema_capsule_name = b"arrow_schema"
+array_capsule_name = b"arrow_array"
+
+capsule_structs = {}
+
+def destroy_schema_capsule(capsule):
+    address = capsule_get_pointer(capsule, schema_capsule_name)
+    schema = capsule_structs.pop(address)
+
+    if schema.release:
+        schema.release(pointer(schema))
+
+def destroy_array_capsule(capsule):
+    address = capsule_get_pointer(capsule, array_capsule_name)
+    array = capsule_structs.pop(address)
+
+    if array.release:
+        array.release(pointer(array))
+
+schema_capsule_destructor = capsule_destructor_function(destroy_schema_capsule)
+array_capsule_destructor = capsule_destructor_function(destroy_array_capsule)
+
+signed_formats = {1 : "c", 2 : "s", 4 : "i", 8 : "l"}
+unsigned_formats = {1 : "C", 2 : "S", 4 : "I", 8 : "L"}
+float_formats = {4 : "f", 8 : "g"}
+
+def fixed_format(fixed_type):
+    if fixed_type._type_ in "fd":
+        return float_formats[sizeof(fixed_type)]
+
+    if fixed_type._type_.isupper():
+        return unsigned_formats[sizeof(fixed_type)]
+
+    return signed_formats[sizeof(fixed_type)]
+
+def pack_bits(flags):
+    if not flags:
+        return create_string_buffer(1)
+
+    bits = "".join(["1" if flag else "0" for flag in reversed(flags)])
+    return create_string_buffer(int(bits, 2).to_bytes((len(flags) + 7) // 8, "little"), (len(flags) + 7) // 8)
+
+class ArrowBatch:
+    def __init__(self, names, columns, length):
+        self.names = tuple(names)
+        self.columns = tuple(columns)
+        self.num_rows = length
+
+    def export_schema(self, schema):
+        objects = []
+        names = [str(name).encode() for name in self.names]
+        children = (POINTER(ArrowSchema) * len(self.columns))()
+
+        for index, (name, (format, validity, null_count, buffers)) in enumerate(zip(names, self.columns)):
+            child = ArrowSchema(format.encode(), name, None, ARROW_FLAG_NULLABLE, 0, None, None, release_schema_callback, None)
+            children[index] = pointer(child)
+            objects.append(child)
+
+        objects.extend((names, children))
+        schema.format = b"+s"
+        schema.name = b""
+        schema.metadata = None
+        schema.flags = 0
+        schema.n_children = len(self.columns)
+        schema.children = children
+        schema.dictionary = None
+        schema.private_data = keep(objects)
+        schema.release = release_schema_callback
+        return schema
+
+    def export_array(self, array):
+        objects = [self.columns]
+        children = (POINTER(ArrowArray) * len(self.columns))()
+
+        for index, (format, validity, null_count, buffers) in enumerate(self.columns):
+            pointers = (c_void_p * (len(buffers) + 1))(addressof(validity) if null_count else None, *[addressof(buffer) for buffer in buffers])
+            child = ArrowArray(self.num_rows, null_count, 0, len(pointers), 0, pointers, None, None, release_array_callback, None)
+            children[index] = pointer(child)
+            objects.extend((pointers, child))
+
+        struct_buffers = (c_void_p * 1)()
+        objects.extend((children, struct_buffers))
+        array.length = self.num_rows
+        array.null_count = 0
+        array.offset = 0
+        array.n_buffers = 1
+        array.n_children = len(self.columns)
+        array.buffers = struct_buffers
+        array.children = children
+        array.dictionary = None
+        array.private_data = keep(objects)
+        array.release = release_array_callback
+        return array
+
+    def __arrow_c_schema__(self):
+        schema = self.export_schema(ArrowSchema())
+        capsule_structs[addressof(schema)] = schema
+        return capsule_new(addressof(schema), schema_capsule_name, schema_capsule_destructor)
+
+    def __arrow_c_array__(self, requested_schema = None):
+        array = self.export_array(ArrowArray())
+        capsule_structs[addressof(array)] = array
+        return (self.__arrow_c_schema__(), capsule_new(addressof(array), array_capsule_name, array_capsule_destructor))
+
+    def to_pyarrow(self):
+        import pyarrow
+
+        return pyarrow.record_batch(self)
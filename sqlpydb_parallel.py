@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import csv
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+
+from ctypes import addressof, c_char
+from multiprocessing import shared_memory
+
+def ranges(low, high, count):
+    step = max(1, -(-(high - low) // count))
+    return [(start, min(start + step, high), ) for start in range(low, high, step)]
+
+def read(connection_factory, sql_template, partitions, workers = 4, ordered = True, processes = False, arraysize = 1024, buffered_blocks = 4):
+    partitions = list(partitions)
+    workers = max(1, min(workers, len(partitions)))
+
+    if processes:
+        return read_processes(connection_factory, sql_template, partitions, workers, ordered, arraysize)
+
+    return read_threads(connection_factory, sql_template, partitions, workers, ordered, arraysize, buffered_blocks)
+
+def read_threads(connection_factory, sql_template, partitions, workers, ordered, arraysize, buffered_blocks):
+    tasks = queue.Queue()
+
+    for task in enumerate(partitions):
+        tasks.put(task)
+
+    if ordered:
+        blocks = [queue.Queue(buffered_blocks) for partition in partitions]
+    else:
+        blocks = [queue.Queue(buffered_blocks * workers)] * len(partitions)
+
+    stop = threading.Event()
+    failures = []
+    threads = [threading.Thread(target = read_partitions,
+                                args = (connection_factory, sql_template, tasks, blocks, stop, failures, arraysize),
+                                daemon = True) for worker in range(workers)]
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        if ordered:
+            for index in range(len(partitions)):
+                yield from drain_blocks(blocks[index], 1, threads, failures)
+        elif partitions:
+            yield from drain_blocks(blocks[0], len(partitions), threads, failures)
+    finally:
+        stop.set()
+
+        for thread in threads:
+            thread.join()
+
+def drain_blocks(blocks, partitions, threads, failures):
+    while partitions > 0:
+        try:
+            rows = blocks.get(timeout = 0.1)
+        except queue.Empty:
+            if failures:
+                raise failures[0]
+
+            if not any(thread.is_alive() for thread in threads) and blocks.empty():
+                raise RuntimeError("PARALLEL READ WORKERS EXITED")
+
+            continue
+
+        if rows is None:
+            partitions = partitions - 1
+        else:
+            yield from rows
+
+def emit(blocks, rows, stop):
+    while not stop.is_set():
+        try:
+            blocks.put(rows, timeout = 0.1)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+def read_partitions(connection_factory, sql_template, tasks, blocks, stop, failures, arraysize):
+    try:
+        connection = connection_factory()
+    except Exception as error:
+        failures.append(error)
+        return
+
+    try:
+        cursor = connection.cursor()
+        cursor.rowset_size = arraysize
+
+        while not stop.is_set():
+            try:
+                index, parameters = tasks.get_nowait()
+            except queue.Empty:
+                break
+
+            cursor.execute(sql_template, parameters)
+            rows = cursor.fetchmany(arraysize)
+
+            while rows:
+                if not emit(blocks[index], rows, stop):
+                    return
+
+                rows = cursor.fetchmany(arraysize)
+
+            emit(blocks[index], None, stop)
+    except Exception as error:
+        failures.append(error)
+    finally:
+        connection.close()
+
+process_connection = None
+
+def open_process_connection(connection_factory):
+    global process_connection
+    process_connection = connection_factory()
+
+def read_process_partition(sql_template, parameters, arraysize):
+    cursor = process_connection.cursor()
+    cursor.rowset_size = arraysize
+    cursor.execute(sql_template, parameters)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def read_processes(connection_factory, sql_template, partitions, workers, ordered, arraysize):
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer = open_process_connection, initargs = (connection_factory, )) as executor:
+        futures = [executor.submit(read_process_partition, sql_template, parameters, arraysize) for parameters in partitions]
+
+        try:
+            for future in (futures if ordered else concurrent.futures.as_completed(futures)):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def attach_segment(name):
+    try:
+        return shared_memory.SharedMemory(name, track = False)
+    except TypeError:
+        return shared_memory.SharedMemory(name)
+
+def decode_block(buffer, columns, overflows, length_format, capacity, start, count):
+    decoded = []
+
+    for (value_format, element_size, value_offset, length_offset), overflow in zip(columns, overflows or [None] * len(columns)):
+        lengths = buffer[length_offset:length_offset + struct.calcsize(length_format) * capacity].cast(length_format)
+        values = buffer[value_offset:value_offset + element_size * capacity]
+        column = []
+
+        if value_format == "s":
+            for row in range(start, start + count):
+                length = lengths[row]
+
+                if length < 0:
+                    column.append(None)
+                elif length < element_size:
+                    column.append(str(values[row * element_size:row * element_size + length], "utf-8"))
+                elif overflow and row in overflow:
+                    column.append(overflow[row])
+                else:
+                    column.append(bytes(values[row * element_size:(row + 1) * element_size]).partition(b"\0")[0].decode())
+        else:
+            values = values.cast(value_format)
+
+            for row in range(start, start + count):
+                column.append(None if lengths[row] < 0 else values[row])
+
+        decoded.append(column)
+
+    return zip(*decoded)
+
+def export_worker(path, length_format, capacity, work, free, done, delimiter, encoding):
+    segments = {}
+    rows = 0
+
+    try:
+        with open(path, "w", newline = "", encoding = encoding) as output:
+            writer = csv.writer(output, delimiter = delimiter)
+            block = work.get()
+
+            while block is not None:
+                name, start, count, columns, overflows = block
+
+                if name not in segments:
+                    segments[name] = attach_segment(name)
+
+                writer.writerows(decode_block(segments[name].buf, columns, overflows, length_format, capacity, start, count))
+                rows = rows + count
+                free.put(name)
+                block = work.get()
+
+        done.put((path, rows, None))
+    except Exception as error:
+        done.put((path, rows, error))
+    finally:
+        for segment in segments.values():
+            segment.close()
+
+def collect_results(done, paths, processes, results, block):
+    while len(results) < len(paths):
+        try:
+            path, rows, error = done.get(block, 0.1)
+        except queue.Empty:
+            if block and any(process.is_alive() for path, process in zip(paths, processes) if not path in results):
+                continue
+
+            try:
+                path, rows, error = done.get(False)
+            except queue.Empty:
+                return results
+
+        results[path] = (rows, error, )
+
+    return results
+
+def raise_failures(results):
+    for rows, error in results.values():
+        if error is not None:
+            raise error
+
+def export(cursor, path_template, workers = None, delimiter = ",", encoding = "utf-8"):
+    if cursor.cached_rows is not None:
+        raise cursor.connection.NotSupportedError("PARALLEL EXPORT OF CACHED RESULT")
+
+    if cursor.pending_rows:
+        raise cursor.connection.NotSupportedError("PARALLEL EXPORT OF PARTIALLY ITERATED RESULT")
+
+    if not cursor.result_buffers:
+        raise cursor.connection.ProgrammingError("NO RESULT SET")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    columns, block_size, capacity = cursor.block_layout()
+    length_format = cursor.block_length_format()
+    segments = dict((segment.name, segment) for segment in [shared_memory.SharedMemory(create = True, size = block_size) for index in range(workers * 2)])
+    context = multiprocessing.get_context()
+    work = context.Queue()
+    free = context.Queue()
+    done = context.Queue()
+    paths = [path_template.format(index) for index in range(workers)]
+    processes = [context.Process(target = export_worker,
+                                 args = (path, length_format, capacity, work, free, done, delimiter, encoding),
+                                 daemon = True) for path in paths]
+
+    for name in segments:
+        free.put(name)
+
+    for process in processes:
+        process.start()
+
+    addresses = dict((name, c_char.from_buffer(segment.buf)) for name, segment in segments.items())
+    results = {}
+
+    try:
+        start, count = cursor.next_rowset_block()
+
+        while count > 0:
+            name = None
+
+            while name is None:
+                try:
+                    name = free.get(timeout = 0.1)
+                except queue.Empty:
+                    raise_failures(collect_results(done, paths, processes, results, False))
+
+                    if not all(process.is_alive() for process in processes):
+                        raise RuntimeError("PARALLEL EXPORT WORKER EXITED")
+
+            columns, block_size, capacity = cursor.block_layout()
+
+            if block_size > segments[name].size:
+                del addresses[name]
+                segment = segments.pop(name)
+                segment.close()
+                segment.unlink()
+                segment = shared_memory.SharedMemory(create = True, size = block_size)
+                name = segment.name
+                segments[name] = segment
+                addresses[name] = c_char.from_buffer(segment.buf)
+
+            cursor.copy_rowset(addressof(addresses[name]))
+            work.put((name, start, count, columns, cursor.block_overflows()))
+            start, count = cursor.next_rowset_block()
+    finally:
+        for process in processes:
+            work.put(None)
+
+        collect_results(done, paths, processes, results, True)
+
+        for process in processes:
+            process.join()
+
+        addresses.clear()
+
+        for segment in segments.values():
+            segment.close()
+            segment.unlink()
+
+    raise_failures(results)
+
+    if len(results) < len(paths):
+        raise RuntimeError("PARALLEL EXPORT WORKER EXITED")
+
+    return [(path, results[path][0], ) for path in paths]